@@ -4,14 +4,53 @@ TCG API Downloader - Direct API approach with BigQuery streaming
 Uses tcgcsv.com API endpoints with rate limiting and real-time BigQuery saves
 """
 import requests
-import pandas as pd
 import time
+import urllib3
 import json
 import os
+import threading
 from datetime import datetime, date
 from typing import Dict, List, Any, Optional
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
+from tqdm import tqdm
+
+# Optional streaming JSON parser, falls back to response.json()
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+class TokenBucket:
+    """Thread-safe token bucket shared by every request issued by a downloader"""
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        """
+        Args:
+            rate: Tokens added per second (requests/second)
+            capacity: Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """Block until a token is available, returns seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
 
 class TCGAPIDownloader:
     def __init__(self, project_id: Optional[str] = None, dataset_id: str = "tcg_data", 
@@ -28,6 +67,7 @@ class TCGAPIDownloader:
         self.base_url = "https://tcgcsv.com/tcgplayer"
         self.min_request_interval = min_request_interval
         self.last_request_time = 0
+        self.limiter = TokenBucket(rate=1 / min_request_interval)
         self.data_dir = "data"
         
         # Create data directory
@@ -86,12 +126,8 @@ class TCGAPIDownloader:
             return None
     
     def _smart_rate_limit(self):
-        """Ensure minimum interval between requests"""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.min_request_interval:
-            remaining = self.min_request_interval - elapsed
-            print(f"    Rate limit: waiting {remaining:.2f}s")
-            time.sleep(remaining)
+        """Take a token from the shared bucket, waiting if the rate is exceeded"""
+        self.limiter.acquire()
     
     def _make_request(self, url: str, description: str = "") -> List[Dict]:
         """Make rate-limited API request"""
@@ -108,12 +144,41 @@ class TCGAPIDownloader:
             data = response.json()['results']
             self.stats['total_requests'] += 1
             
-            print(f"    API {description}: {len(data)} items in {elapsed:.2f}s")
+            tqdm.write(f"    API {description}: {len(data)} items in {elapsed:.2f}s")
             return data
             
         except requests.exceptions.RequestException as e:
-            print(f"    API Error {description}: {e}")
+            tqdm.write(f"    API Error {description}: {e}")
+            raise
+    
+    def _iter_request(self, url: str, description: str = ""):
+        """
+        Make rate-limited API request, yielding 'results' items one at a time
+        
+        Streams the response body through ijson so a large group is never
+        held in memory as a fully parsed list alongside its BigQuery rows.
+        """
+        if not IJSON_AVAILABLE:
+            yield from self._make_request(url, description)
+            return
+        
+        self._smart_rate_limit()
+        
+        try:
+            with requests.get(url, stream=True) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                
+                yield from ijson.items(response.raw, 'results.item', use_float=True)
+            
+        # Reading response.raw surfaces urllib3 and ijson errors, not RequestException
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError,
+                ijson.JSONError) as e:
+            tqdm.write(f"    API Error {description}: {e}")
             raise
+        
+        self.last_request_time = time.time()
+        self.stats['total_requests'] += 1
     
     def stream_to_bigquery(self, rows: List[Dict], force: bool = False):
         """
@@ -141,14 +206,14 @@ class TCGAPIDownloader:
                     if self.current_batch:
                         table = self._create_table_from_data(self.current_batch[0])
                     else:
-                        print("    No data to create table schema")
+                        tqdm.write("    No data to create table schema")
                         return 0
                 
                 # Stream insert
                 errors = self.bq_client.insert_rows_json(table, self.current_batch)
                 
                 if errors:
-                    print(f"    BigQuery insert errors: {errors}")
+                    tqdm.write(f"    BigQuery insert errors: {errors}")
                     # Save to CSV as backup
                     self._save_to_csv_backup(self.current_batch)
                     rows_inserted = 0
@@ -157,14 +222,14 @@ class TCGAPIDownloader:
                     self.total_rows_inserted += rows_inserted
                 
                 elapsed = time.time() - start_time
-                print(f"    BigQuery: {rows_inserted} rows in {elapsed:.2f}s")
+                tqdm.write(f"    BigQuery: {rows_inserted} rows in {elapsed:.2f}s")
                 
                 # Clear batch
                 self.current_batch = []
                 return rows_inserted
                 
             except Exception as e:
-                print(f"    BigQuery error: {e}")
+                tqdm.write(f"    BigQuery error: {e}")
                 self._save_to_csv_backup(self.current_batch)
                 self.current_batch = []
                 return 0
@@ -173,7 +238,7 @@ class TCGAPIDownloader:
     
     def _create_table_from_data(self, sample_row: Dict) -> bigquery.Table:
         """Create BigQuery table from sample data"""
-        print(f"    Creating table {self.table_id}...")
+        tqdm.write(f"    Creating table {self.table_id}...")
         
         # Define schema based on sample row
         schema = []
@@ -212,7 +277,7 @@ class TCGAPIDownloader:
             table.clustering_fields = [product_id_field]
         
         table = self.bq_client.create_table(table)
-        print(f"    Created table with {len(schema)} columns")
+        tqdm.write(f"    Created table with {len(schema)} columns")
         
         return table
     
@@ -243,11 +308,12 @@ class TCGAPIDownloader:
         backup_file = os.path.join(self.data_dir, f"backup_{timestamp}.csv")
         
         try:
+            import pandas as pd
             df = pd.DataFrame(rows)
             df.to_csv(backup_file, index=False)
-            print(f"    Backup saved: {backup_file}")
+            tqdm.write(f"    Backup saved: {backup_file}")
         except Exception as e:
-            print(f"    Backup save error: {e}")
+            tqdm.write(f"    Backup save error: {e}")
     
     def download_categories(self) -> List[Dict]:
         """Download all categories from TCG API"""
@@ -268,28 +334,14 @@ class TCGAPIDownloader:
                                      f"products for group {group_id}")
         return products
     
-    def download_and_save_group(self, category: Dict, group: Dict) -> int:
-        """
-        Download products for a group and prepare for BigQuery streaming
-        
-        Returns:
-            Number of products processed
-        """
+    def _iter_group_rows(self, category: Dict, group: Dict):
+        """Stream products for a group, yielding one denormalized record at a time"""
         category_id = str(category['categoryId'])
         group_id = str(group['groupId'])
-        group_name = group.get('name', f'Group {group_id}')
-        
-        print(f"\n🔍 Processing: {category['name']} / {group_name}")
         
-        # Download products for this group
-        products = self.download_products(category_id, group_id)
+        products = self._iter_request(f"{self.base_url}/{category_id}/{group_id}/products",
+                                      f"products for group {group_id}")
         
-        if not products:
-            print(f"    No products found")
-            return 0
-        
-        # Build denormalized records
-        rows_to_insert = []
         for product in products:
             record = {}
             
@@ -308,15 +360,58 @@ class TCGAPIDownloader:
             # Add metadata
             record['update_date'] = date.today().isoformat()
             
-            rows_to_insert.append(record)
+            yield record
+    
+    def fetch_group_products(self, category: Dict, group: Dict) -> List[Dict]:
+        """
+        Download products for a group and build denormalized records
         
-        print(f"    Found {len(products)} products")
-        self.stats['total_products'] += len(products)
+        Network-only half of download_and_save_group, so the next group's
+        request can be issued while the current rows are being inserted.
+        The whole group is materialized here; use download_and_save_group
+        when memory should stay bounded by batch_size.
+        
+        Returns:
+            List of row dictionaries ready for BigQuery
+        """
+        return list(self._iter_group_rows(category, group))
+    
+    def insert_rows(self, rows: List[Dict]) -> int:
+        """
+        Queue fetched group rows for BigQuery streaming
+        
+        Returns:
+            Number of products processed
+        """
+        if not rows:
+            return 0
+        
+        self.stats['total_products'] += len(rows)
         
         # Add to batch for BigQuery streaming
-        self.stream_to_bigquery(rows_to_insert)
+        self.stream_to_bigquery(rows)
         
-        return len(products)
+        return len(rows)
+    
+    def download_and_save_group(self, category: Dict, group: Dict) -> int:
+        """
+        Download products for a group and prepare for BigQuery streaming
+        
+        Rows are handed to the BigQuery buffer every batch_size records as
+        they stream in, so memory stays bounded by the batch, not the group.
+        
+        Returns:
+            Number of products processed
+        """
+        processed = 0
+        batch = []
+        for record in self._iter_group_rows(category, group):
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                processed += self.insert_rows(batch)
+                batch = []
+        
+        return processed + self.insert_rows(batch)
     
     def download_all(self, limit_categories: Optional[int] = None, 
                      limit_groups_per_category: Optional[int] = None) -> int:
@@ -365,16 +460,17 @@ class TCGAPIDownloader:
             self.stats['total_groups'] += len(groups)
             
             # Process each group
-            for grp_idx, group in enumerate(groups, 1):
-                products_count = self.download_and_save_group(category, group)
-                
-                # Progress update
-                elapsed = time.time() - self.stats['start_time']
-                total_requests = self.stats['total_requests']
-                req_rate = total_requests / elapsed if elapsed > 0 else 0
-                
-                print(f"     [{grp_idx}/{len(groups)}] +{products_count} products "
-                      f"(Total: {self.stats['total_products']:,}, Rate: {req_rate:.2f} req/s)")
+            with tqdm(groups, desc=f"cat {category_name}", unit="group", mininterval=0.5) as bar:
+                for group in bar:
+                    self.download_and_save_group(category, group)
+                    
+                    # Progress update
+                    elapsed = time.time() - self.stats['start_time']
+                    total_requests = self.stats['total_requests']
+                    req_rate = total_requests / elapsed if elapsed > 0 else 0
+                    
+                    bar.set_postfix(products=f"{self.stats['total_products']:,}",
+                                    rate=f"{req_rate:.2f} req/s", refresh=False)
         
         # Flush remaining batch
         print(f"\n💾 Flushing final batch...")
@@ -4,7 +4,6 @@ BigQuery Loader for TCG Metadata
 Handles table creation, schema management, and data verification
 """
 import os
-import pandas as pd
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
 from typing import Dict, Any, List, Optional
@@ -24,6 +23,7 @@ class BigQueryMetadataLoader:
         self.dataset_ref = self.client.dataset(dataset_id)
         self.table_name = "tcg_metadata"
         self.table_ref = f"{self.project_id}.{dataset_id}.{self.table_name}"
+        self._table = None
         
         print(f"BigQuery Loader initialized")
         print(f"  Project: {self.project_id}")
@@ -44,10 +44,24 @@ class BigQueryMetadataLoader:
             dataset = self.client.create_dataset(dataset, timeout=30)
             print(f"  Created dataset {self.dataset_id}")
     
+    def get_table(self, refresh: bool = False) -> bigquery.Table:
+        """
+        Get the metadata table, fetching it from BigQuery only once
+        
+        Args:
+            refresh: Force a new lookup (e.g. after rows were inserted)
+            
+        Raises:
+            NotFound: If the table does not exist
+        """
+        if self._table is None or refresh:
+            self._table = self.client.get_table(self.table_ref)
+        return self._table
+    
     def get_table_info(self) -> Dict[str, Any]:
         """Get information about the API table"""
         try:
-            table = self.client.get_table(self.table_ref)
+            table = self.get_table()
             return {
                 'exists': True,
                 'num_rows': table.num_rows,
@@ -223,6 +237,7 @@ class BigQueryMetadataLoader:
             
             job = self.client.query(query)
             job.result()  # Wait for completion
+            self._table = None
             
             print(f"Deleted data for date: {target_date}")
             return True
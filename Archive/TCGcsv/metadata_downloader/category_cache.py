@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Local disk cache for the tcgcsv.com category list
+Shared by the runners so warm restarts skip the categories request
+"""
+import os
+import time
+from typing import Dict, List, Optional
+
+import orjson
+
+CATEGORIES_URL = "https://tcgcsv.com/tcgplayer/categories"
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "categories.json")
+CACHE_TTL = 3600  # seconds
+
+
+def load_cached_categories(ttl: float = CACHE_TTL, cache_file: str = CACHE_FILE) -> Optional[List[Dict]]:
+    """
+    Return the cached category list if it is younger than ttl
+
+    Args:
+        ttl: Maximum cache age in seconds
+        cache_file: Path to the cache file
+
+    Returns:
+        List of category dicts, or None if the cache is missing, stale or unreadable
+    """
+    try:
+        if time.time() - os.path.getmtime(cache_file) >= ttl:
+            return None
+        with open(cache_file, 'rb') as f:
+            return orjson.loads(f.read())
+    except (OSError, orjson.JSONDecodeError):
+        return None
+
+
+def save_cached_categories(categories: List[Dict], cache_file: str = CACHE_FILE) -> bool:
+    """
+    Atomically overwrite the cache file with a freshly fetched category list
+
+    The cache is best-effort: an empty list is not cached (it would pin an
+    empty result for the whole TTL) and write errors are swallowed.
+
+    Returns:
+        True if the cache file was written
+    """
+    if not categories:
+        return False
+
+    tmp_file = f"{cache_file}.tmp"
+    try:
+        with open(tmp_file, 'wb') as f:
+            f.write(orjson.dumps(categories))
+        os.replace(tmp_file, cache_file)
+        return True
+    except OSError:
+        try:
+            os.remove(tmp_file)
+        except OSError:
+            pass
+        return False
+
+
+def cached_categories(ttl: float = CACHE_TTL, cache_file: str = CACHE_FILE, timeout: float = 30) -> List[Dict]:
+    """
+    Get the category list from the disk cache, fetching and caching it when stale
+
+    Args:
+        ttl: Maximum cache age in seconds
+        cache_file: Path to the cache file
+        timeout: Request timeout for the fetch
+
+    Returns:
+        List of category dicts
+    """
+    categories = load_cached_categories(ttl, cache_file)
+    if categories is not None:
+        return categories
+
+    import requests
+    response = requests.get(CATEGORIES_URL, timeout=timeout)
+    response.raise_for_status()
+    categories = orjson.loads(response.content).get('results') or []
+    save_cached_categories(categories, cache_file)
+    return categories
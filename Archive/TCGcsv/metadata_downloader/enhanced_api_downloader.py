@@ -10,9 +10,11 @@ import json
 import os
 import logging
 import signal
+import sqlite3
 import sys
+import tempfile
 from datetime import datetime, date
-from typing import Dict, List, Any, Optional, Set
+from typing import Dict, List, Any, Optional, Set, Tuple
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
 from dataclasses import dataclass, asdict
@@ -25,6 +27,12 @@ try:
 except ImportError:
     PROXY_MANAGER_AVAILABLE = False
 
+# Checkpoint files with these extensions are stored in SQLite (WAL) instead of JSON
+SQLITE_CHECKPOINT_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')
+
+# Completed groups are committed to the SQLite checkpoint in batches of this size
+CHECKPOINT_COMMIT_EVERY = 100
+
 @dataclass
 class DownloadCheckpoint:
     """Checkpoint data structure"""
@@ -61,7 +69,8 @@ class EnhancedTCGMetadataDownloader:
                  proxy_config: Optional[Dict] = None,
                  use_proxy_manager: bool = True,
                  mihomo_api_url: str = "http://127.0.0.1:9090",
-                 mihomo_secret: str = ""):
+                 mihomo_secret: str = "",
+                 use_load_jobs: bool = False):
         """
         Initialize Enhanced TCG Metadata downloader with full resume support
         
@@ -71,13 +80,15 @@ class EnhancedTCGMetadataDownloader:
             table_id: BigQuery table name
             min_request_interval: Minimum seconds between API requests
             batch_size: Number of rows to batch before streaming to BigQuery
-            checkpoint_file: Path to checkpoint JSON file
+            checkpoint_file: Path to checkpoint file (JSON, or SQLite for .db/.sqlite)
             log_file: Path to log file
             config_file: Path to YAML config file
             proxy_config: Dict with proxy settings (http, https keys) - legacy mode
             use_proxy_manager: Use Mihomo proxy manager for automatic switching
             mihomo_api_url: Mihomo API URL
             mihomo_secret: Mihomo API secret
+            use_load_jobs: Spool rows to NDJSON and load each category with a
+                load job instead of streaming inserts
         """
         self.base_url = "https://tcgcsv.com/tcgplayer"
         self.min_request_interval = min_request_interval
@@ -142,7 +153,17 @@ class EnhancedTCGMetadataDownloader:
         self.current_batch = []
         self.total_rows_inserted = 0
         
+        # Load-job mode: rows are spooled to an NDJSON file and loaded per category
+        self.use_load_jobs = use_load_jobs
+        self._spool = None
+        self._spool_rows = 0
+        self._spool_sample = None
+        # Groups whose rows sit in the spool; marked completed once their load job succeeds
+        self._pending_groups: List[Tuple[str, str]] = []
+        
         # Checkpoint system
+        self._checkpoint_db = None
+        self._uncommitted_groups = 0
         self.checkpoint = self._load_checkpoint()
         
         # Graceful shutdown handler
@@ -230,18 +251,91 @@ class EnhancedTCGMetadataDownloader:
         file_handler.setFormatter(file_format)
         self.logger.addHandler(file_handler)
         
+    def _use_sqlite_checkpoint(self) -> bool:
+        return self.checkpoint_file.endswith(SQLITE_CHECKPOINT_EXTENSIONS)
+    
+    def _open_checkpoint_db(self) -> sqlite3.Connection:
+        """Open (once) the SQLite checkpoint in WAL mode and create its tables"""
+        if self._checkpoint_db is None:
+            db = sqlite3.connect(self.checkpoint_file)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS completed (
+                    category_id INTEGER, group_id INTEGER, ts REAL,
+                    PRIMARY KEY (category_id, group_id)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS failed (
+                    group_key TEXT PRIMARY KEY, error TEXT
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS state (
+                    key TEXT PRIMARY KEY, value TEXT
+                ) WITHOUT ROWID;
+            """)
+            self._checkpoint_db = db
+        return self._checkpoint_db
+    
+    def _load_sqlite_checkpoint(self) -> DownloadCheckpoint:
+        """Rebuild the in-memory checkpoint from the SQLite tables"""
+        db = self._open_checkpoint_db()
+        state = {key: json.loads(value) for key, value in db.execute("SELECT key, value FROM state")}
+        checkpoint = DownloadCheckpoint(**state)
+        checkpoint.completed_groups = {
+            f"{category_id}:{group_id}"
+            for category_id, group_id in db.execute("SELECT category_id, group_id FROM completed")
+        }
+        checkpoint.failed_groups = dict(db.execute("SELECT group_key, error FROM failed"))
+        if not checkpoint.started_at:
+            checkpoint.started_at = datetime.now().isoformat()
+        self.logger.info(f"Loaded checkpoint: {len(checkpoint.completed_groups)} groups completed")
+        return checkpoint
+    
+    @staticmethod
+    def _read_json_checkpoint(path: str) -> DownloadCheckpoint:
+        """Parse a JSON checkpoint file"""
+        with open(path, 'r') as f:
+            data = json.load(f)
+        # Convert completed_groups back to set
+        if 'completed_groups' in data and isinstance(data['completed_groups'], list):
+            data['completed_groups'] = set(data['completed_groups'])
+        return DownloadCheckpoint(**data)
+    
+    def _migrate_json_checkpoint(self, json_file: str) -> DownloadCheckpoint:
+        """Import a JSON checkpoint into a fresh SQLite checkpoint"""
+        checkpoint = self._read_json_checkpoint(json_file)
+        db = self._open_checkpoint_db()
+        now = time.time()
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO completed (category_id, group_id, ts) VALUES (?, ?, ?)",
+                [(*map(int, key.split(':')), now) for key in checkpoint.completed_groups]
+            )
+            db.executemany(
+                "INSERT OR REPLACE INTO failed (group_key, error) VALUES (?, ?)",
+                checkpoint.failed_groups.items()
+            )
+        self.checkpoint = checkpoint
+        self._save_checkpoint()
+        self.logger.info(f"Migrated {len(checkpoint.completed_groups)} completed groups from {json_file}")
+        return checkpoint
+    
     def _load_checkpoint(self) -> DownloadCheckpoint:
         """Load checkpoint from file or create new one"""
-        if os.path.exists(self.checkpoint_file):
+        if self._use_sqlite_checkpoint():
+            # Carry over progress from a JSON checkpoint of the same name
+            json_file = os.path.splitext(self.checkpoint_file)[0] + '.json'
+            if not os.path.exists(self.checkpoint_file) and os.path.exists(json_file):
+                # Let a failed migration stop the run rather than re-load everything
+                return self._migrate_json_checkpoint(json_file)
+            try:
+                return self._load_sqlite_checkpoint()
+            except Exception as e:
+                self.logger.warning(f"Failed to load checkpoint, starting fresh: {e}")
+        elif os.path.exists(self.checkpoint_file):
             try:
-                with open(self.checkpoint_file, 'r') as f:
-                    data = json.load(f)
-                    # Convert completed_groups back to set
-                    if 'completed_groups' in data and isinstance(data['completed_groups'], list):
-                        data['completed_groups'] = set(data['completed_groups'])
-                    checkpoint = DownloadCheckpoint(**data)
-                    self.logger.info(f"Loaded checkpoint: {len(checkpoint.completed_groups)} groups completed")
-                    return checkpoint
+                checkpoint = self._read_json_checkpoint(self.checkpoint_file)
+                self.logger.info(f"Loaded checkpoint: {len(checkpoint.completed_groups)} groups completed")
+                return checkpoint
             except Exception as e:
                 self.logger.warning(f"Failed to load checkpoint, starting fresh: {e}")
         
@@ -253,6 +347,20 @@ class EnhancedTCGMetadataDownloader:
         """Save current checkpoint to file"""
         try:
             self.checkpoint.last_updated = datetime.now().isoformat()
+            
+            if self._checkpoint_db is not None:
+                # Groups are already rows; only the small scalar state is rewritten
+                data = asdict(self.checkpoint)
+                del data['completed_groups'], data['failed_groups']
+                with self._checkpoint_db:
+                    self._checkpoint_db.executemany(
+                        "INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)",
+                        [(key, json.dumps(value)) for key, value in data.items()]
+                    )
+                self._uncommitted_groups = 0
+                self.logger.debug("Checkpoint saved")
+                return
+            
             # Convert set to list for JSON serialization
             data = asdict(self.checkpoint)
             data['completed_groups'] = list(self.checkpoint.completed_groups)
@@ -266,11 +374,11 @@ class EnhancedTCGMetadataDownloader:
     def _signal_handler(self, signum, frame):
         """Handle graceful shutdown on signals"""
         self.logger.info(f"Received signal {signum}, shutting down gracefully...")
-        self._save_checkpoint()
-        # Flush remaining batch
-        if self.current_batch:
+        # Flush remaining batch first so groups it completes are in the saved checkpoint
+        if self.current_batch or self._spool is not None:
             self.logger.info("Flushing remaining batch...")
             self.stream_to_bigquery([], force=True)
+        self._save_checkpoint()
         self.logger.info("Graceful shutdown complete")
         sys.exit(0)
     
@@ -368,6 +476,10 @@ class EnhancedTCGMetadataDownloader:
         """Stream insert rows to BigQuery with batching and error handling"""
         if not rows and not force:
             return 0
+        
+        if self.use_load_jobs:
+            self._spool_for_load_job(rows)
+            return self.flush_load_job() if force else 0
             
         self.current_batch.extend(rows)
         
@@ -418,6 +530,71 @@ class EnhancedTCGMetadataDownloader:
         
         return 0
     
+    def _spool_for_load_job(self, rows: List[Dict]):
+        """Append rows to the NDJSON spool file for the next load job"""
+        if not rows:
+            return
+        
+        if self._spool is None:
+            self._spool = tempfile.NamedTemporaryFile(
+                mode='w+b', suffix='.ndjson', dir=self.data_dir, delete=False
+            )
+            self._spool_sample = rows[0]
+        
+        self._spool.writelines(json.dumps(row).encode('utf-8') + b'\n' for row in rows)
+        self._spool_rows += len(rows)
+    
+    def flush_load_job(self) -> int:
+        """Load the spooled NDJSON file into BigQuery with a single load job
+        
+        Returns:
+            Number of rows loaded (0 if nothing was spooled or the load failed)
+        """
+        if self._spool is None:
+            return 0
+        
+        spool, rows, sample = self._spool, self._spool_rows, self._spool_sample
+        self._spool, self._spool_rows, self._spool_sample = None, 0, None
+        pending_groups, self._pending_groups = self._pending_groups, []
+        start_time = time.time()
+        
+        try:
+            # Create table on first load if it doesn't exist
+            try:
+                self.bq_client.get_table(self.table_ref)
+            except NotFound:
+                self._create_table_from_data(sample)
+            
+            job_config = bigquery.LoadJobConfig(
+                source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+                write_disposition=bigquery.WriteDisposition.WRITE_APPEND
+            )
+            spool.seek(0)
+            job = self.bq_client.load_table_from_file(spool, self.table_ref, job_config=job_config)
+            job.result()
+            
+            spool.close()
+            os.remove(spool.name)
+            self.total_rows_inserted += rows
+            for category_id, group_id in pending_groups:
+                self.mark_group_completed(category_id, group_id)
+            
+            elapsed = time.time() - start_time
+            self.logger.info(f"BigQuery load job: {rows} rows in {elapsed:.3f}s")
+            return rows
+            
+        except Exception as e:
+            self.logger.error(f"BigQuery load job error: {e} ({len(pending_groups)} groups left incomplete)")
+            spool.close()
+            if self.config['bigquery']['create_backup']:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                backup_file = os.path.join(self.data_dir, f"backup_enhanced_{timestamp}.ndjson")
+                os.replace(spool.name, backup_file)
+                self.logger.info(f"Backup saved: {backup_file}")
+            else:
+                os.remove(spool.name)
+            return 0
+    
     def _create_table_from_data(self, sample_row: Dict) -> bigquery.Table:
         """Create BigQuery table from sample data with partitioning and clustering"""
         self.logger.info(f"Creating table {self.table_id}...")
@@ -526,14 +703,37 @@ class EnhancedTCGMetadataDownloader:
         # Remove from failed groups if it was there
         if group_key in self.checkpoint.failed_groups:
             del self.checkpoint.failed_groups[group_key]
-        self._save_checkpoint()
+        
+        if self._checkpoint_db is None:
+            self._save_checkpoint()
+            return
+        
+        # SQLite: O(1) row insert, committed in batches
+        self._checkpoint_db.execute(
+            "INSERT OR REPLACE INTO completed (category_id, group_id, ts) VALUES (?, ?, ?)",
+            (int(category_id), int(group_id), time.time())
+        )
+        self._checkpoint_db.execute("DELETE FROM failed WHERE group_key = ?", (group_key,))
+        self._uncommitted_groups += 1
+        if self._uncommitted_groups >= CHECKPOINT_COMMIT_EVERY:
+            self._checkpoint_db.commit()
+            self._uncommitted_groups = 0
     
     def mark_group_failed(self, category_id: str, group_id: str, error: str):
         """Mark a group as failed with error message"""
         group_key = f"{category_id}:{group_id}"
         self.checkpoint.failed_groups[group_key] = error
         self.logger.error(f"Group {group_key} failed: {error}")
-        self._save_checkpoint()
+        
+        if self._checkpoint_db is None:
+            self._save_checkpoint()
+            return
+        
+        with self._checkpoint_db:
+            self._checkpoint_db.execute(
+                "INSERT OR REPLACE INTO failed (group_key, error) VALUES (?, ?)", (group_key, error)
+            )
+        self._uncommitted_groups = 0
     
     def download_and_save_group(self, category: Dict, group: Dict) -> int:
         """Download products for a group and prepare for BigQuery streaming with error handling"""
@@ -589,8 +789,11 @@ class EnhancedTCGMetadataDownloader:
             # Add to batch for BigQuery streaming
             self.stream_to_bigquery(rows_to_insert)
             
-            # Mark group as completed
-            self.mark_group_completed(category_id, group_id)
+            # Mark group as completed (load-job mode waits for flush_load_job)
+            if self.use_load_jobs:
+                self._pending_groups.append((category_id, group_id))
+            else:
+                self.mark_group_completed(category_id, group_id)
             
             return len(products)
             
@@ -669,6 +872,12 @@ class EnhancedTCGMetadataDownloader:
                     self.logger.error(f"Failed to process group {group_id}: {e}")
                     continue
             
+            # One load job per category in load-job mode; if it fails its groups stay incomplete
+            if self.use_load_jobs:
+                pending_groups = len(self._pending_groups)
+                if not self.flush_load_job():
+                    category_stats['groups_failed'] += pending_groups
+            
             # Mark category as completed if all groups processed
             if category_stats['groups_failed'] == 0:
                 self.checkpoint.completed_categories.append(int(category_id))
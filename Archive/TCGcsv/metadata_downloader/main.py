@@ -6,22 +6,27 @@ Provides command-line interface for downloading TCG metadata
 import sys
 import os
 import argparse
+import math
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from dotenv import load_dotenv
+from tqdm import tqdm
 
 # Add current directory to path for imports
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from api_downloader import TCGAPIDownloader
-from bigquery_loader import BigQueryMetadataLoader
+# api_downloader and bigquery_loader pull in requests and the Google Cloud
+# SDK, so they are imported inside the modes that need them to keep
+# `--help` and `status` fast.
 
-def test_download():
+def test_download(min_request_interval: float = 1.2):
     """Run a test download with limited data"""
     print("🧪 TEST MODE: Downloading Pokemon category (first 3 groups)")
     print("="*60)
     
+    from api_downloader import TCGAPIDownloader
     downloader = TCGAPIDownloader(
-        min_request_interval=1.2,
+        min_request_interval=min_request_interval,
         batch_size=100
     )
     
@@ -38,6 +43,7 @@ def test_download():
         if total_products > 0:
             # Verify in BigQuery
             print(f"\n🔍 Verifying data in BigQuery...")
+            from bigquery_loader import BigQueryMetadataLoader
             loader = BigQueryMetadataLoader()
             verification = loader.verify_data(limit=5)
             
@@ -55,12 +61,12 @@ def test_download():
         print(f"❌ Test failed: {e}")
         return False
 
-def full_download():
+def full_download(min_request_interval: float = 1.2):
     """Run a full download of all TCG data"""
     print("🚀 FULL DOWNLOAD MODE: All categories and groups")
     print("="*60)
     print("⚠️  This will take approximately 1-2 hours")
-    print("⚠️  Rate limited to <1 request per second")
+    print(f"⚠️  Rate limited to {1/min_request_interval:.2f} requests per second")
     
     # Confirm with user
     response = input("\nProceed with full download? (y/N): ")
@@ -68,8 +74,9 @@ def full_download():
         print("Download cancelled")
         return False
     
+    from api_downloader import TCGAPIDownloader
     downloader = TCGAPIDownloader(
-        min_request_interval=1.2,
+        min_request_interval=min_request_interval,
         batch_size=1000  # Larger batches for efficiency
     )
     
@@ -82,6 +89,7 @@ def full_download():
         
         # Show final BigQuery summary
         print(f"\n📊 BigQuery Summary:")
+        from bigquery_loader import BigQueryMetadataLoader
         loader = BigQueryMetadataLoader()
         loader.print_table_summary()
         
@@ -95,13 +103,15 @@ def full_download():
         print(f"❌ Full download failed: {e}")
         return False
 
-def category_download(category_ids: list, limit_groups: int = None):
+def category_download(category_ids: list, limit_groups: int = None,
+                      min_request_interval: float = 1.2):
     """Download specific categories"""
     print(f"🎯 CATEGORY DOWNLOAD: {', '.join(map(str, category_ids))}")
     print("="*60)
     
+    from api_downloader import TCGAPIDownloader
     downloader = TCGAPIDownloader(
-        min_request_interval=1.2,
+        min_request_interval=min_request_interval,
         batch_size=500
     )
     
@@ -135,10 +145,20 @@ def category_download(category_ids: list, limit_groups: int = None):
             
             print(f"   Found {len(groups)} groups")
             
-            # Process each group
-            for group in groups:
-                products_count = downloader.download_and_save_group(category, group)
-                total_products += products_count
+            if not groups:
+                continue
+            
+            # Process each group, prefetching the next group's products
+            # while the current rows are inserted into BigQuery
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                next_fut = executor.submit(downloader.fetch_group_products, category, groups[0])
+                for i in tqdm(range(len(groups)), desc=f"cat {category['name']}",
+                              unit="group", mininterval=0.5):
+                    rows = next_fut.result()
+                    if i + 1 < len(groups):
+                        next_fut = executor.submit(downloader.fetch_group_products,
+                                                   category, groups[i + 1])
+                    total_products += downloader.insert_rows(rows)
         
         # Flush final batch
         downloader.stream_to_bigquery([], force=True)
@@ -158,6 +178,7 @@ def show_status():
     print("="*40)
     
     try:
+        from bigquery_loader import BigQueryMetadataLoader
         loader = BigQueryMetadataLoader()
         loader.print_table_summary()
         return True
@@ -165,6 +186,21 @@ def show_status():
         print(f"❌ Error accessing BigQuery: {e}")
         return False
 
+def positive_float(value: str) -> float:
+    """argparse type for a finite float that must be greater than zero"""
+    number = float(value)
+    if not (math.isfinite(number) and number > 0):
+        raise argparse.ArgumentTypeError(f"must be a positive finite number, got {value}")
+    return number
+
+# Mode name -> handler taking the parsed argparse namespace
+DISPATCH = {
+    'test': lambda a: test_download(1 / a.rps),
+    'full': lambda a: full_download(1 / a.rps),
+    'category': lambda a: category_download(a.category_ids, a.limit, 1 / a.rps),
+    'status': lambda a: show_status(),
+}
+
 def main():
     """Main command-line interface"""
     parser = argparse.ArgumentParser(
@@ -176,16 +212,19 @@ Examples:
   python3 main.py full                    # Full download (all data)
   python3 main.py category 3              # Download Pokemon category
   python3 main.py category 3 5 --limit 10 # Download categories 3,5 (first 10 groups each)
+  python3 main.py category 3 --rps 0.5    # Download Pokemon at 0.5 req/s
   python3 main.py status                  # Show BigQuery table status
         """
     )
     
-    parser.add_argument('mode', choices=['test', 'full', 'category', 'status'],
+    parser.add_argument('mode', choices=list(DISPATCH),
                        help='Download mode')
     parser.add_argument('category_ids', nargs='*', type=int,
                        help='Category IDs for category mode')
     parser.add_argument('--limit', type=int,
                        help='Limit groups per category')
+    parser.add_argument('--rps', type=positive_float, default=1/1.2,
+                       help='Maximum API requests per second (default: 0.83)')
     parser.add_argument('--project', type=str,
                        help='Google Cloud project ID')
     parser.add_argument('--dataset', type=str, default='tcg_data',
@@ -207,24 +246,13 @@ Examples:
     if args.project:
         os.environ['GOOGLE_CLOUD_PROJECT'] = args.project
     
-    # Route to appropriate function
-    success = False
+    if args.mode == 'category' and not args.category_ids:
+        print("❌ Category mode requires category IDs")
+        print("Example: python3 main.py category 3 5")
+        return 1
     
-    if args.mode == 'test':
-        success = test_download()
-        
-    elif args.mode == 'full':
-        success = full_download()
-        
-    elif args.mode == 'category':
-        if not args.category_ids:
-            print("❌ Category mode requires category IDs")
-            print("Example: python3 main.py category 3 5")
-            return 1
-        success = category_download(args.category_ids, args.limit)
-        
-    elif args.mode == 'status':
-        success = show_status()
+    # Route to appropriate function
+    success = DISPATCH[args.mode](args)
     
     # Exit with appropriate code
     if success:
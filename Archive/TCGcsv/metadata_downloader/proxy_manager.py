@@ -4,17 +4,75 @@ Mihomo Proxy Manager with Automatic Switching
 Manages proxy switching based on rate limits and failures
 """
 
+import asyncio
+import heapq
 import requests
+from requests.structures import CaseInsensitiveDict
+import urllib3
 import json
+import math
 import time
 import random
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
+from typing import ClassVar, Dict, List, Any, Optional, Set, Tuple
 import logging
 from dataclasses import dataclass, field
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, urlencode, urlparse
 import threading
 
+# Mihomo built-ins that are never switch targets
+_SYSTEM_PROXIES = frozenset(('DIRECT', 'REJECT', 'GLOBAL'))
+
+# Individual proxy types (as reported by /proxies) eligible for switching
+_USABLE_PROXY_TYPES = frozenset((
+    'Shadowsocks', 'ShadowsocksR', 'Vmess', 'Trojan',
+    'VLESS', 'Hysteria', 'Hysteria2', 'TUIC'
+))
+
+# requests kwargs that don't affect the response body, so cached GETs still apply
+_CACHE_NEUTRAL_KWARGS = frozenset(('timeout', 'allow_redirects', 'verify'))
+
+# Optional async data plane
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+def _mono_to_isoformat(mono: float, wall_offset: float) -> Optional[str]:
+    """Convert a time.monotonic() stamp to a wall-clock ISO string (None if unset)"""
+    if not mono:
+        return None
+    return datetime.fromtimestamp(mono + wall_offset).isoformat()
+
+
+def _response_from_cache(url: str, entry: Tuple) -> requests.Response:
+    """Build a fresh Response from an immutable response cache entry"""
+    _, status_code, content, headers, encoding = entry
+    response = requests.Response()
+    response.url = url
+    response.status_code = status_code
+    response._content = content
+    # Marks the body as read so iter_content/iter_lines slice _content instead of raw
+    response._content_consumed = True
+    response.headers = CaseInsensitiveDict(headers)
+    response.encoding = encoding
+    return response
+
+
+@dataclass
+class AsyncResponse:
+    """Fully-read response returned by the async request path"""
+    status_code: int
+    content: bytes
+    headers: Dict[str, str]
+    
+    def json(self) -> Any:
+        return json.loads(self.content)
+
 
 @dataclass
 class ProxyStats:
@@ -22,14 +80,22 @@ class ProxyStats:
     name: str
     success_count: int = 0
     failure_count: int = 0
-    last_success: Optional[datetime] = None
-    last_failure: Optional[datetime] = None
+    # time.monotonic() stamps; 0.0 means never
+    last_success_mono: float = 0.0
+    last_failure_mono: float = 0.0
     avg_response_time: float = 0.0
     consecutive_failures: int = 0
     is_healthy: bool = True
     total_requests: int = 0
     rate_limited_count: int = 0
-    last_rate_limit: Optional[datetime] = None
+    last_rate_limit_mono: float = 0.0
+    peak_response_time: float = 0.0
+    in_flight: int = 0
+    # Per-proxy lock guarding counters and compound updates (EWMA, health transitions)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    
+    # EWMA smoothing factor for avg_response_time
+    alpha: ClassVar[float] = 0.2
     
     @property
     def success_rate(self) -> float:
@@ -38,34 +104,60 @@ class ProxyStats:
             return 100.0
         return (self.success_count / self.total_requests) * 100
     
+    @property
+    def peak_ewma(self) -> float:
+        """Latency EWMA scaled by outstanding requests (peak-EWMA load score)"""
+        return self.avg_response_time * (1 + self.in_flight)
+    
     def record_success(self, response_time: float):
         """Record successful request"""
-        self.success_count += 1
-        self.total_requests += 1
-        self.last_success = datetime.now()
-        self.consecutive_failures = 0
-        self.is_healthy = True
-        
-        # Update average response time
-        if self.avg_response_time == 0:
-            self.avg_response_time = response_time
-        else:
-            self.avg_response_time = (self.avg_response_time + response_time) / 2
+        now = time.monotonic()
+        
+        with self.lock:
+            self.success_count += 1
+            self.total_requests += 1
+            self.last_success_mono = now
+            self.consecutive_failures = 0
+            self.is_healthy = True
+            
+            # Exponentially-weighted moving average of response time
+            if self.success_count == 1:
+                self.avg_response_time = response_time
+            else:
+                self.avg_response_time = (1 - self.alpha) * self.avg_response_time + self.alpha * response_time
+            self.peak_response_time = max(self.peak_response_time, response_time)
     
-    def record_failure(self, is_rate_limit: bool = False):
-        """Record failed request"""
-        self.failure_count += 1
-        self.total_requests += 1
-        self.last_failure = datetime.now()
-        self.consecutive_failures += 1
-        
-        if is_rate_limit:
-            self.rate_limited_count += 1
-            self.last_rate_limit = datetime.now()
-        
-        # Mark as unhealthy after multiple consecutive failures
-        if self.consecutive_failures >= 3:
-            self.is_healthy = False
+    def record_failure(self, is_rate_limit: bool = False) -> bool:
+        """Record failed request, returns True if the proxy should cool down"""
+        now = time.monotonic()
+        
+        with self.lock:
+            self.failure_count += 1
+            self.total_requests += 1
+            self.last_failure_mono = now
+            
+            if is_rate_limit:
+                self.rate_limited_count += 1
+                self.last_rate_limit_mono = now
+            
+            self.consecutive_failures += 1
+            
+            # Mark as unhealthy after multiple consecutive failures
+            if self.consecutive_failures >= 3:
+                self.is_healthy = False
+            
+            return is_rate_limit or not self.is_healthy
+    
+    def set_health(self, is_healthy: bool):
+        """Set health from an external check, resetting the failure streak if healthy"""
+        with self.lock:
+            self.is_healthy = is_healthy
+            if is_healthy:
+                self.consecutive_failures = 0
+
+
+# Shared read-only stats for proxies that have none recorded yet
+_DEFAULT_STATS = ProxyStats(name='')
 
 
 class MihomoProxyManager:
@@ -75,7 +167,10 @@ class MihomoProxyManager:
                  rate_limit_codes: List[int] = None,
                  max_retries_per_proxy: int = 3,
                  proxy_cooldown: int = 300,  # 5 minutes
-                 health_check_interval: int = 600):  # 10 minutes
+                 health_check_interval: int = 600,  # 10 minutes
+                 lb_algorithm: str = 'best',
+                 log_level: int = logging.WARNING,
+                 cache_responses: bool = False):
         """
         Initialize Mihomo Proxy Manager
         
@@ -86,21 +181,54 @@ class MihomoProxyManager:
             max_retries_per_proxy: Max retries before switching proxy
             proxy_cooldown: Seconds to wait before retrying failed proxy
             health_check_interval: Seconds between proxy health checks
+            lb_algorithm: Proxy selection strategy - 'best' (always the top-ranked proxy),
+                or opt in to 'p2c' (power of two choices) / 'weighted_random' to spread load
+            log_level: Logger level; pass logging.INFO to log every switch/selection
+            cache_responses: Serve repeated plain GETs from a short-lived response cache
         """
+        if lb_algorithm not in ('p2c', 'weighted_random', 'best'):
+            raise ValueError(f"Unsupported lb_algorithm: {lb_algorithm}")
+        
         self.api_url = api_url.rstrip('/')
         self.secret = secret
-        self.rate_limit_codes = rate_limit_codes or [403, 429, 503, 502, 504]
+        self.rate_limit_codes = frozenset(rate_limit_codes or (403, 429, 503, 502, 504))
         self.max_retries_per_proxy = max_retries_per_proxy
         self.proxy_cooldown = proxy_cooldown
         self.health_check_interval = health_check_interval
+        self.lb_algorithm = lb_algorithm
         
         # Proxy statistics and management
         self.proxy_stats: Dict[str, ProxyStats] = {}
         self.available_proxies: List[str] = []
         self.current_proxy: Optional[str] = None
+        self._current_proxy_cache_ts = 0.0
+        self._current_proxy_ttl = 5  # seconds
+        self._proxies_state: Optional[Dict[str, Any]] = None
+        self._proxies_state_ts = 0.0
+        self._proxies_ttl = 2  # seconds
         self.proxy_groups: Dict[str, List[str]] = {}
         
-        # Request session with retries
+        # Keep-alive connection pool for the Mihomo control API
+        self._api_path = urlparse(self.api_url).path
+        self._pool = urllib3.connection_from_url(
+            self.api_url,
+            maxsize=32,
+            block=False,
+            retries=urllib3.Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[500, 502, 503, 504]
+            ),
+            timeout=urllib3.Timeout(connect=2, read=10)
+        )
+        # Authentication - mihomo accepts either a bearer token or a query parameter
+        self._api_headers = {'Content-Type': 'application/json'}
+        self._api_query = ''
+        if self.secret:
+            self._api_headers['Authorization'] = f'Bearer {self.secret}'
+            self._api_query = urlencode({'secret': self.secret})
+        
+        # Request session with retries for outbound data-plane requests
         self.session = requests.Session()
         adapter = requests.adapters.HTTPAdapter(
             max_retries=requests.packages.urllib3.util.retry.Retry(
@@ -112,23 +240,34 @@ class MihomoProxyManager:
         self.session.mount('http://', adapter)
         self.session.mount('https://', adapter)
         
-        # Authentication headers - mihomo uses different auth methods
-        if self.secret:
-            # Try multiple authentication methods
-            self.session.headers.update({'Authorization': f'Bearer {self.secret}'})
-            # Also add as query parameter for compatibility
-            self.session.params = {'secret': self.secret}
-        
-        # Threading lock for thread-safe operations
+        # Proxies cooling down after rate limits / repeated failures:
+        # min-heap of (ready_at_monotonic, name) plus the latest ready_at per name
+        self._cooldown_heap: List[Tuple[float, str]] = []
+        self._in_cooldown: Dict[str, float] = {}
+        self._cooldown_lock = threading.Lock()
+        
+        # Optional short-lived cache of successful GET responses keyed by URL, holding
+        # (stored_at, status_code, content, headers, encoding) so callers never share a Response
+        self.cache_responses = cache_responses
+        self._resp_cache: 'OrderedDict[str, Tuple[float, int, bytes, Tuple[Tuple[str, str], ...], Optional[str]]]' = OrderedDict()
+        self._resp_cache_ttl = 300  # seconds
+        self._resp_cache_max = 1024
+        self._resp_cache_lock = threading.Lock()
+        
+        # Async session and switch lock, created on first async request
+        self._async_session = None
+        self._async_lock: Optional[asyncio.Lock] = None
+        
+        # Serializes selector switches; stats use per-proxy locks
         self._lock = threading.Lock()
         
         # Setup logging
         self.logger = logging.getLogger('proxy_manager')
-        self.logger.setLevel(logging.INFO)
+        self.logger.setLevel(log_level)
         
+        # Level is controlled on the logger only, the handler passes everything through
         if not self.logger.handlers:
             console_handler = logging.StreamHandler()
-            console_handler.setLevel(logging.INFO)
             formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
             console_handler.setFormatter(formatter)
             self.logger.addHandler(console_handler)
@@ -136,7 +275,7 @@ class MihomoProxyManager:
         # Initialize proxy information
         self._initialize_proxies()
         
-        self.logger.info(f"Proxy Manager initialized with {len(self.available_proxies)} proxies")
+        self.logger.info("Proxy Manager initialized with %s proxies", len(self.available_proxies))
     
     def _initialize_proxies(self):
         """Initialize proxy information from Mihomo API"""
@@ -144,118 +283,220 @@ class MihomoProxyManager:
             proxies_info = self._api_request('GET', '/proxies')
             
             if 'proxies' in proxies_info:
-                for proxy_name, proxy_info in proxies_info['proxies'].items():
-                    if proxy_name not in ['DIRECT', 'REJECT', 'GLOBAL']:
-                        # Initialize proxy stats
-                        self.proxy_stats[proxy_name] = ProxyStats(name=proxy_name)
-                        
-                        # Add to appropriate groups
-                        proxy_type = proxy_info.get('type', 'unknown')
-                        if proxy_type in ['Shadowsocks', 'ShadowsocksR', 'Vmess', 'Trojan']:
-                            self.available_proxies.append(proxy_name)
-                        
-                        # Track proxy groups
-                        if proxy_type == 'Selector':
-                            group_proxies = proxy_info.get('all', [])
-                            self.proxy_groups[proxy_name] = group_proxies
+                proxies = [
+                    (proxy_name, proxy_info.get('type', 'unknown'), proxy_info)
+                    for proxy_name, proxy_info in proxies_info['proxies'].items()
+                    if proxy_name not in _SYSTEM_PROXIES
+                ]
+                
+                # Initialize proxy stats
+                self.proxy_stats = {name: ProxyStats(name=name) for name, _, _ in proxies}
+                
+                # Individual proxies usable for switching
+                self.available_proxies = [
+                    name for name, proxy_type, _ in proxies if proxy_type in _USABLE_PROXY_TYPES
+                ]
+                
+                # Track proxy groups
+                self.proxy_groups = {
+                    name: info.get('all', []) for name, proxy_type, info in proxies
+                    if proxy_type == 'Selector'
+                }
             
-            self.logger.info(f"Initialized {len(self.available_proxies)} individual proxies")
-            self.logger.info(f"Found {len(self.proxy_groups)} proxy groups")
+            self.logger.info("Initialized %s individual proxies", len(self.available_proxies))
+            self.logger.info("Found %s proxy groups", len(self.proxy_groups))
             
         except Exception as e:
-            self.logger.error(f"Failed to initialize proxies: {e}")
+            self.logger.error("Failed to initialize proxies: %s", e)
             # Fallback: assume basic proxy setup
             self.available_proxies = ['auto-switch', 'manual-select']
     
-    def _api_request(self, method: str, endpoint: str, data: Any = None) -> Dict[str, Any]:
+    def _api_request_raw(self, method: str, endpoint: str, data: Any = None,
+                         **request_kwargs) -> Tuple[int, bytes]:
         """
-        Make request to Mihomo API
+        Make request to Mihomo API without interpreting the status code
         
         Args:
             method: HTTP method
             endpoint: API endpoint
             data: Request data
+            **request_kwargs: Overrides for the pool request (e.g. retries, timeout)
             
         Returns:
-            Response JSON data
+            (status code, raw response body)
         """
-        url = f"{self.api_url}{endpoint}"
+        method = method.upper()
+        if method not in ('GET', 'PUT', 'POST'):
+            raise ValueError(f"Unsupported method: {method}")
+        
+        path = f"{self._api_path}{endpoint}"
+        if self._api_query:
+            path += ('&' if '?' in path else '?') + self._api_query
         
         try:
-            if method.upper() == 'GET':
-                response = self.session.get(url, timeout=10)
-            elif method.upper() == 'PUT':
-                response = self.session.put(url, json=data, timeout=10)
-            elif method.upper() == 'POST':
-                response = self.session.post(url, json=data, timeout=10)
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-            
-            response.raise_for_status()
-            return response.json()
+            response = self._pool.request(
+                method,
+                path,
+                body=json.dumps(data).encode() if data is not None else None,
+                headers=self._api_headers,
+                **request_kwargs
+            )
+            return response.status, response.data
             
-        except requests.exceptions.RequestException as e:
-            self.logger.error(f"API request failed [{method} {endpoint}]: {e}")
+        except urllib3.exceptions.HTTPError as e:
+            self.logger.error("API request failed [%s %s]: %s", method, endpoint, e)
             raise
     
-    def get_current_proxy(self) -> Optional[str]:
-        """Get currently selected proxy from mihomo"""
+    def _api_request(self, method: str, endpoint: str, data: Any = None,
+                     **request_kwargs) -> Dict[str, Any]:
+        """
+        Make request to Mihomo API
+        
+        Args:
+            method: HTTP method
+            endpoint: API endpoint
+            data: Request data
+            **request_kwargs: Overrides for the pool request (e.g. retries, timeout)
+            
+        Returns:
+            Response JSON data
+        """
+        status, body = self._api_request_raw(method, endpoint, data, **request_kwargs)
+        
+        if status >= 400:
+            self.logger.error("API request failed [%s %s]: HTTP %s", method.upper(), endpoint, status)
+            raise urllib3.exceptions.HTTPError(f"HTTP {status}")
+        return json.loads(body) if body else {}
+    
+    def _fetch_all_proxies_state(self, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Get the state of every proxy and selector in one /proxies call
+        
+        Cached for a couple of seconds so several selector lookups share
+        one API round-trip.
+        """
+        if (refresh or self._proxies_state is None
+                or time.time() - self._proxies_state_ts >= self._proxies_ttl):
+            self._proxies_state = self._api_request('GET', '/proxies')
+            self._proxies_state_ts = time.time()
+        return self._proxies_state
+    
+    def get_current_proxy(self, refresh: bool = False) -> Optional[str]:
+        """
+        Get currently selected proxy from mihomo
+        
+        The result is cached for a few seconds so the request hot path does
+        not hit the Mihomo API before and after every request.
+        
+        Args:
+            refresh: Bypass the cache and query the API
+        """
+        if not refresh and time.time() - self._current_proxy_cache_ts < self._current_proxy_ttl:
+            return self.current_proxy
+        
         try:
-            # Check manual-select group first
-            if 'manual-select' in self.proxy_groups:
-                selector_info = self._api_request('GET', '/proxies/manual-select')
-                return selector_info.get('now')
+            state = self._fetch_all_proxies_state(refresh=refresh).get('proxies', {})
+            current = None
             
-            # Fallback to auto-switch group
-            if 'auto-switch' in self.proxy_groups:
-                selector_info = self._api_request('GET', '/proxies/auto-switch')
-                return selector_info.get('now')
+            # Check manual-select group first, then fall back to auto-switch
+            for group in ('manual-select', 'auto-switch'):
+                info = state.get(group)
+                if info and info.get('now'):
+                    current = info['now']
+                    break
             
-            return None
+            self.current_proxy = current
+            self._current_proxy_cache_ts = time.time()
+            return current
             
         except Exception as e:
-            self.logger.error(f"Failed to get current proxy: {e}")
+            self.logger.error("Failed to get current proxy: %s", e)
             return None
     
-    def switch_proxy(self, target_proxy: str, group: str = "manual-select") -> bool:
+    def switch_proxy(self, target_proxy: str, group: str = "manual-select",
+                     verify: bool = False) -> bool:
         """
         Switch to a specific proxy
         
         Args:
             target_proxy: Name of proxy to switch to
             group: Proxy group to switch in
+            verify: Poll the selector until it reports the new proxy
             
         Returns:
             True if switch successful
         """
         try:
             with self._lock:
-                self.logger.info(f"Switching to proxy: {target_proxy} in group: {group}")
+                self.logger.info("Switching to proxy: %s in group: %s", target_proxy, group)
                 
-                # Make API call to switch proxy
-                self._api_request('PUT', f'/proxies/{group}', {'name': target_proxy})
+                # Mihomo answers 204 on success and 4xx otherwise, so the PUT
+                # status alone tells whether the switch happened
+                status, _ = self._api_request_raw('PUT', f'/proxies/{quote(group, safe="")}',
+                                                  {'name': target_proxy})
+                self._proxies_state = None
+                
+                if status != 204:
+                    self.logger.warning("⚠️ Switch to %s rejected (HTTP %s)", target_proxy, status)
+                    return False
+                
+                if verify:
+                    # Poll with short backoff instead of a fixed delay
+                    current = None
+                    for delay in (0.005, 0.01, 0.02, None):
+                        current = self.get_current_proxy(refresh=True)
+                        if current == target_proxy or delay is None:
+                            break
+                        time.sleep(delay)
+                    
+                    if current != target_proxy:
+                        self.logger.warning("⚠️ Switch verification failed. Expected: %s, Got: %s", target_proxy, current)
+                        return False
                 
                 # Update current proxy
                 self.current_proxy = target_proxy
+                self._current_proxy_cache_ts = time.time()
                 
-                # Verify the switch
-                time.sleep(1)  # Brief delay for switch to take effect
-                current = self.get_current_proxy()
-                
-                if current == target_proxy:
-                    self.logger.info(f"✅ Successfully switched to: {target_proxy}")
-                    return True
-                else:
-                    self.logger.warning(f"⚠️ Switch verification failed. Expected: {target_proxy}, Got: {current}")
-                    return False
+                self.logger.info("✅ Successfully switched to: %s", target_proxy)
+                return True
             
         except Exception as e:
-            self.logger.error(f"Failed to switch proxy to {target_proxy}: {e}")
+            self.logger.error("Failed to switch proxy to %s: %s", target_proxy, e)
             return False
     
+    def _record_failure(self, proxy_name: Optional[str], is_rate_limit: bool = False):
+        """Record a failure and put the proxy in cooldown if it was rate limited or went unhealthy"""
+        if not proxy_name or proxy_name not in self.proxy_stats:
+            return
+        
+        if self.proxy_stats[proxy_name].record_failure(is_rate_limit):
+            ready_at = time.monotonic() + self.proxy_cooldown
+            with self._cooldown_lock:
+                self._in_cooldown[proxy_name] = ready_at
+                heapq.heappush(self._cooldown_heap, (ready_at, proxy_name))
+    
+    def _release_cooldowns(self) -> Set[str]:
+        """Release proxies whose cooldown expired, returns names still cooling down"""
+        now = time.monotonic()
+        released = []
+        with self._cooldown_lock:
+            while self._cooldown_heap and self._cooldown_heap[0][0] <= now:
+                ready_at, name = heapq.heappop(self._cooldown_heap)
+                # Skip stale entries superseded by a later cooldown
+                if self._in_cooldown.get(name) == ready_at:
+                    del self._in_cooldown[name]
+                    released.append(name)
+            cooling = set(self._in_cooldown)
+        
+        # Cooldown elapsed: give the proxy another chance
+        for name in released:
+            self.proxy_stats[name].set_health(True)
+        
+        return cooling
+    
     def get_best_proxy(self, exclude: List[str] = None) -> Optional[str]:
         """
-        Get the best available proxy based on performance stats
+        Pick an available proxy based on performance stats and lb_algorithm
         
         Args:
             exclude: List of proxy names to exclude
@@ -264,11 +505,13 @@ class MihomoProxyManager:
             Name of best proxy, or None if no suitable proxy found
         """
         exclude = exclude or []
+        cooling = self._release_cooldowns()
         
-        # Filter healthy proxies not in exclude list
+        # Filter healthy proxies not in exclude list or cooldown
         candidates = [
             name for name in self.available_proxies 
-            if name not in exclude and self.proxy_stats.get(name, ProxyStats(name)).is_healthy
+            if name not in exclude and name not in cooling
+            and self.proxy_stats.get(name, _DEFAULT_STATS).is_healthy
         ]
         
         if not candidates:
@@ -279,16 +522,34 @@ class MihomoProxyManager:
             self.logger.error("No proxies available")
             return None
         
-        # Sort by performance metrics
-        def proxy_score(proxy_name: str) -> Tuple[float, float, int]:
-            stats = self.proxy_stats.get(proxy_name, ProxyStats(proxy_name))
-            # Priority: success rate, low response time, fewer rate limits
-            return (stats.success_rate, -stats.avg_response_time, -stats.rate_limited_count)
+        if len(candidates) == 1:
+            return candidates[0]
+        
+        # Rank by performance metrics
+        def proxy_score(stats: ProxyStats) -> Tuple[float, float, int]:
+            # Priority: success rate, low load-adjusted latency, fewer rate limits
+            return (stats.success_rate, -stats.peak_ewma, -stats.rate_limited_count)
         
-        candidates.sort(key=proxy_score, reverse=True)
-        best_proxy = candidates[0]
+        # Resolve stats once per candidate
+        stats_view = [
+            (name, self.proxy_stats.get(name, _DEFAULT_STATS))
+            for name in candidates
+        ]
+        
+        if self.lb_algorithm == 'weighted_random':
+            # Spread load in proportion to health instead of stampeding the top proxy
+            # Floored so heavily rate-limited proxies (exp underflows to 0.0) keep a nonzero total
+            weights = [max(max(1.0, stats.success_rate) * math.exp(-stats.rate_limited_count), 1e-9)
+                       for _, stats in stats_view]
+            best_proxy, best_stats = random.choices(stats_view, weights=weights, k=1)[0]
+        elif self.lb_algorithm == 'p2c' and len(stats_view) >= 2:
+            # Power of two choices: better of two random candidates
+            a, b = random.sample(stats_view, 2)
+            best_proxy, best_stats = a if proxy_score(a[1]) >= proxy_score(b[1]) else b
+        else:
+            best_proxy, best_stats = max(stats_view, key=lambda item: proxy_score(item[1]))
         
-        self.logger.info(f"Selected best proxy: {best_proxy} (success rate: {self.proxy_stats.get(best_proxy, ProxyStats(best_proxy)).success_rate:.1f}%)")
+        self.logger.info("Selected proxy (%s): %s (success rate: %.1f%%)", self.lb_algorithm, best_proxy, best_stats.success_rate)
         return best_proxy
     
     def handle_request_error(self, response_code: int, proxy_name: str) -> str:
@@ -305,19 +566,18 @@ class MihomoProxyManager:
         is_rate_limit = response_code in self.rate_limit_codes
         
         # Record the failure
-        if proxy_name in self.proxy_stats:
-            self.proxy_stats[proxy_name].record_failure(is_rate_limit)
+        self._record_failure(proxy_name, is_rate_limit)
         
         if is_rate_limit:
-            self.logger.warning(f"Rate limit detected (HTTP {response_code}) on proxy: {proxy_name}")
+            self.logger.warning("Rate limit detected (HTTP %s) on proxy: %s", response_code, proxy_name)
             return 'switch'
         
         elif response_code >= 500:
-            self.logger.warning(f"Server error (HTTP {response_code}) on proxy: {proxy_name}")
-            return 'retry' if self.proxy_stats.get(proxy_name, ProxyStats(proxy_name)).consecutive_failures < 2 else 'switch'
+            self.logger.warning("Server error (HTTP %s) on proxy: %s", response_code, proxy_name)
+            return 'retry' if self.proxy_stats.get(proxy_name, _DEFAULT_STATS).consecutive_failures < 2 else 'switch'
         
         else:
-            self.logger.error(f"Client error (HTTP {response_code}) on proxy: {proxy_name}")
+            self.logger.error("Client error (HTTP %s) on proxy: %s", response_code, proxy_name)
             return 'abort'
     
     def auto_switch_on_error(self, response_code: int) -> bool:
@@ -369,147 +629,342 @@ class MihomoProxyManager:
         Raises:
             requests.RequestException: If all proxies fail
         """
+        # Serve repeated plain GETs from the response cache (transport-only
+        # options like timeout don't change the payload)
+        cacheable = (self.cache_responses and method.upper() == 'GET'
+                     and set(kwargs) <= _CACHE_NEUTRAL_KWARGS)
+        cache_key = url if cacheable else None
+        if cache_key:
+            with self._resp_cache_lock:
+                cached = self._resp_cache.get(cache_key)
+                if cached and time.time() - cached[0] < self._resp_cache_ttl:
+                    self._resp_cache.move_to_end(cache_key)
+                    return _response_from_cache(url, cached)
+        
         switches_made = 0
         last_error = None
+        current_proxy = self.get_current_proxy()
         
         while switches_made <= max_switches:
-            current_proxy = self.get_current_proxy()
-            
+            proxy_stats = self.proxy_stats.get(current_proxy) if current_proxy else None
             try:
                 start_time = time.time()
                 
                 # Make the request
-                response = self.session.request(method, url, **kwargs)
+                if proxy_stats:
+                    proxy_stats.in_flight += 1
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                finally:
+                    if proxy_stats:
+                        proxy_stats.in_flight -= 1
                 
                 # Calculate response time
                 response_time = time.time() - start_time
                 
                 # Check for rate limiting or errors
                 if response.status_code in self.rate_limit_codes:
-                    self.logger.warning(f"Rate limit response (HTTP {response.status_code}) from {current_proxy}")
+                    self.logger.warning("Rate limit response (HTTP %s) from %s", response.status_code, current_proxy)
                     
                     if switches_made < max_switches:
                         if self.auto_switch_on_error(response.status_code):
                             switches_made += 1
+                            current_proxy = self.get_current_proxy()
                             time.sleep(1)  # Brief delay before retry
                             continue
                         else:
                             break
                     else:
                         # Record the failure but return the response
-                        if current_proxy and current_proxy in self.proxy_stats:
-                            self.proxy_stats[current_proxy].record_failure(is_rate_limit=True)
+                        self._record_failure(current_proxy, is_rate_limit=True)
                         return response
                 
                 # Success - record stats
                 if current_proxy and current_proxy in self.proxy_stats:
                     self.proxy_stats[current_proxy].record_success(response_time)
                 
+                if cache_key and response.ok:
+                    with self._resp_cache_lock:
+                        self._resp_cache[cache_key] = (time.time(), response.status_code, response.content,
+                                                       tuple(response.headers.items()), response.encoding)
+                        self._resp_cache.move_to_end(cache_key)
+                        if len(self._resp_cache) > self._resp_cache_max:
+                            self._resp_cache.popitem(last=False)
+                
                 return response
                 
             except requests.exceptions.RequestException as e:
                 last_error = e
-                self.logger.error(f"Request failed on proxy {current_proxy}: {e}")
+                self.logger.error("Request failed on proxy %s: %s", current_proxy, e)
                 
                 # Record failure
-                if current_proxy and current_proxy in self.proxy_stats:
-                    self.proxy_stats[current_proxy].record_failure()
+                self._record_failure(current_proxy)
                 
                 # Try switching proxy
                 if switches_made < max_switches:
                     if self.auto_switch_on_error(500):  # Treat network errors as server errors
                         switches_made += 1
+                        current_proxy = self.get_current_proxy()
                         time.sleep(2)  # Longer delay for network errors
                         continue
                 
                 break
         
         # All proxies failed
-        self.logger.error(f"All proxy attempts failed after {switches_made} switches")
+        self.logger.error("All proxy attempts failed after %s switches", switches_made)
         if last_error:
             raise last_error
         else:
             raise requests.exceptions.RequestException("All proxy attempts failed")
     
+    def _get_async_session(self) -> 'aiohttp.ClientSession':
+        """Get the pooled aiohttp session, creating it inside the running loop"""
+        if self._async_session is None or self._async_session.closed:
+            connector = aiohttp.TCPConnector(limit=100, limit_per_host=20, keepalive_timeout=60)
+            # trust_env routes requests through HTTP(S)_PROXY (the mihomo mixed-port), like requests does
+            self._async_session = aiohttp.ClientSession(connector=connector, trust_env=True)
+            self._async_lock = asyncio.Lock()
+        return self._async_session
+    
+    async def _auto_switch_on_error_async(self, response_code: int) -> bool:
+        """Run auto_switch_on_error off the event loop, one switch at a time"""
+        async with self._async_lock:
+            return await asyncio.to_thread(self.auto_switch_on_error, response_code)
+    
+    async def make_request_with_auto_switch_async(self,
+                                                  url: str,
+                                                  method: str = 'GET',
+                                                  max_switches: int = 3,
+                                                  **kwargs) -> AsyncResponse:
+        """
+        Async variant of make_request_with_auto_switch using a pooled aiohttp session
+        
+        Many calls can run concurrently through the same proxy, e.g.
+        asyncio.gather(*[manager.make_request_with_auto_switch_async(u) for u in urls]).
+        Proxy switches still go through the Mihomo API and are serialized.
+        
+        Args:
+            url: URL to request
+            method: HTTP method
+            max_switches: Maximum number of proxy switches to attempt
+            **kwargs: Additional arguments for aiohttp
+            
+        Returns:
+            AsyncResponse with status, body and headers
+            
+        Raises:
+            aiohttp.ClientError or asyncio.TimeoutError: If all proxies fail
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp is required for async requests (pip install aiohttp)")
+        
+        session = self._get_async_session()
+        switches_made = 0
+        last_error = None
+        current_proxy = await asyncio.to_thread(self.get_current_proxy)
+        
+        while switches_made <= max_switches:
+            proxy_stats = self.proxy_stats.get(current_proxy) if current_proxy else None
+            try:
+                start_time = time.time()
+                
+                # Make the request
+                if proxy_stats:
+                    proxy_stats.in_flight += 1
+                try:
+                    async with session.request(method, url, **kwargs) as resp:
+                        response = AsyncResponse(resp.status, await resp.read(), dict(resp.headers))
+                finally:
+                    if proxy_stats:
+                        proxy_stats.in_flight -= 1
+                
+                # Calculate response time
+                response_time = time.time() - start_time
+                
+                # Check for rate limiting or errors
+                if response.status_code in self.rate_limit_codes:
+                    self.logger.warning("Rate limit response (HTTP %s) from %s", response.status_code, current_proxy)
+                    
+                    if switches_made < max_switches:
+                        if await self._auto_switch_on_error_async(response.status_code):
+                            switches_made += 1
+                            current_proxy = await asyncio.to_thread(self.get_current_proxy)
+                            await asyncio.sleep(1)  # Brief delay before retry
+                            continue
+                        else:
+                            break
+                    else:
+                        # Record the failure but return the response
+                        self._record_failure(current_proxy, is_rate_limit=True)
+                        return response
+                
+                # Success - record stats
+                if proxy_stats:
+                    proxy_stats.record_success(response_time)
+                
+                return response
+                
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                last_error = e
+                self.logger.error("Request failed on proxy %s: %s", current_proxy, e)
+                
+                # Record failure
+                self._record_failure(current_proxy)
+                
+                # Try switching proxy
+                if switches_made < max_switches:
+                    if await self._auto_switch_on_error_async(500):  # Treat network errors as server errors
+                        switches_made += 1
+                        current_proxy = await asyncio.to_thread(self.get_current_proxy)
+                        await asyncio.sleep(2)  # Longer delay for network errors
+                        continue
+                
+                break
+        
+        # All proxies failed
+        self.logger.error("All proxy attempts failed after %s switches", switches_made)
+        if last_error:
+            raise last_error
+        else:
+            raise aiohttp.ClientError("All proxy attempts failed")
+    
+    async def aclose(self):
+        """Close the async session if one was opened"""
+        if self._async_session is not None and not self._async_session.closed:
+            await self._async_session.close()
+    
     def get_proxy_statistics(self) -> Dict[str, Any]:
         """Get comprehensive proxy statistics"""
-        stats = {
-            'total_proxies': len(self.available_proxies),
-            'healthy_proxies': len([p for p in self.proxy_stats.values() if p.is_healthy]),
-            'current_proxy': self.get_current_proxy(),
-            'proxy_details': {},
-            'summary': {
-                'total_requests': sum(p.total_requests for p in self.proxy_stats.values()),
-                'total_successes': sum(p.success_count for p in self.proxy_stats.values()),
-                'total_failures': sum(p.failure_count for p in self.proxy_stats.values()),
-                'total_rate_limits': sum(p.rate_limited_count for p in self.proxy_stats.values())
-            }
-        }
+        total_requests = total_successes = total_failures = total_rate_limits = 0
+        healthy_proxies = 0
+        proxy_details = {}
+        wall_offset = time.time() - time.monotonic()
         
-        # Individual proxy details
+        # Aggregate totals and build per-proxy details in one pass
         for name, proxy_stats in self.proxy_stats.items():
-            stats['proxy_details'][name] = {
+            total_requests += proxy_stats.total_requests
+            total_successes += proxy_stats.success_count
+            total_failures += proxy_stats.failure_count
+            total_rate_limits += proxy_stats.rate_limited_count
+            healthy_proxies += proxy_stats.is_healthy
+            
+            proxy_details[name] = {
                 'success_rate': proxy_stats.success_rate,
                 'total_requests': proxy_stats.total_requests,
                 'consecutive_failures': proxy_stats.consecutive_failures,
                 'is_healthy': proxy_stats.is_healthy,
                 'avg_response_time': proxy_stats.avg_response_time,
+                'peak_response_time': proxy_stats.peak_response_time,
                 'rate_limited_count': proxy_stats.rate_limited_count,
-                'last_success': proxy_stats.last_success.isoformat() if proxy_stats.last_success else None,
-                'last_failure': proxy_stats.last_failure.isoformat() if proxy_stats.last_failure else None
+                'last_success': _mono_to_isoformat(proxy_stats.last_success_mono, wall_offset),
+                'last_failure': _mono_to_isoformat(proxy_stats.last_failure_mono, wall_offset)
             }
         
-        return stats
+        return {
+            'total_proxies': len(self.available_proxies),
+            'healthy_proxies': healthy_proxies,
+            'current_proxy': self.get_current_proxy(),
+            'proxy_details': proxy_details,
+            'summary': {
+                'total_requests': total_requests,
+                'total_successes': total_successes,
+                'total_failures': total_failures,
+                'total_rate_limits': total_rate_limits
+            }
+        }
     
-    def health_check_all_proxies(self) -> Dict[str, bool]:
+    def health_check_all_proxies(self, max_workers: int = 16) -> Dict[str, bool]:
         """
         Perform health check on all available proxies
         
+        Uses mihomo's per-proxy delay endpoint, so proxies are probed in
+        parallel without switching the active selector.
+        
+        Args:
+            max_workers: Number of concurrent probes
+            
         Returns:
             Dict mapping proxy names to health status
         """
         self.logger.info("Starting proxy health check...")
-        health_results = {}
         
         # Test URL - using a reliable service
         test_url = "https://httpbin.org/ip"
+        query = urlencode({'url': test_url, 'timeout': 10000})
         
-        current_proxy = self.get_current_proxy()
+        def probe(proxy_name: str) -> bool:
+            try:
+                result = self._api_request(
+                    'GET', f'/proxies/{quote(proxy_name, safe="")}/delay?{query}',
+                    retries=False,
+                    timeout=urllib3.Timeout(connect=2, read=15)
+                )
+                return result.get('delay', 0) > 0
+            except Exception as e:
+                self.logger.warning("Health check failed for %s: %s", proxy_name, e)
+                return False
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            health_results = dict(zip(self.available_proxies,
+                                      executor.map(probe, self.available_proxies)))
+        
+        return self._apply_health_results(health_results)
+    
+    async def health_check_all_proxies_async(self, max_concurrency: int = 64) -> Dict[str, bool]:
+        """
+        Async variant of health_check_all_proxies using aiohttp
         
-        for proxy_name in self.available_proxies:
+        All delay probes are issued concurrently against the Mihomo API,
+        bounded by the connector limit.
+        
+        Args:
+            max_concurrency: Maximum number of probes in flight
+            
+        Returns:
+            Dict mapping proxy names to health status
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise RuntimeError("aiohttp is required for async requests (pip install aiohttp)")
+        
+        self.logger.info("Starting async proxy health check...")
+        
+        test_url = "https://httpbin.org/ip"
+        params = {'url': test_url, 'timeout': '10000'}
+        if self.secret:
+            params['secret'] = self.secret
+        timeout = aiohttp.ClientTimeout(sock_connect=2, total=15)
+        
+        async def probe(session: 'aiohttp.ClientSession', proxy_name: str) -> bool:
             try:
-                # Switch to proxy
-                if self.switch_proxy(proxy_name):
-                    # Test the proxy
-                    response = self.session.get(test_url, timeout=10)
-                    if response.status_code == 200:
-                        health_results[proxy_name] = True
-                        if proxy_name in self.proxy_stats:
-                            self.proxy_stats[proxy_name].is_healthy = True
-                            self.proxy_stats[proxy_name].consecutive_failures = 0
-                    else:
-                        health_results[proxy_name] = False
-                        if proxy_name in self.proxy_stats:
-                            self.proxy_stats[proxy_name].is_healthy = False
-                else:
-                    health_results[proxy_name] = False
-                    
+                async with session.get(f"{self.api_url}/proxies/{quote(proxy_name, safe='')}/delay",
+                                       params=params, headers=self._api_headers) as resp:
+                    if resp.status >= 400:
+                        raise aiohttp.ClientResponseError(resp.request_info, resp.history,
+                                                          status=resp.status)
+                    result = await resp.json()
+                return result.get('delay', 0) > 0
             except Exception as e:
-                self.logger.warning(f"Health check failed for {proxy_name}: {e}")
-                health_results[proxy_name] = False
-                if proxy_name in self.proxy_stats:
-                    self.proxy_stats[proxy_name].is_healthy = False
+                self.logger.warning("Health check failed for %s: %s", proxy_name, e)
+                return False
         
-        # Restore original proxy
-        if current_proxy and current_proxy != self.get_current_proxy():
-            self.switch_proxy(current_proxy)
+        # The control API is local, so this session ignores HTTP(S)_PROXY
+        connector = aiohttp.TCPConnector(limit=max_concurrency)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            statuses = await asyncio.gather(*(probe(session, name) for name in self.available_proxies))
+        
+        return self._apply_health_results(dict(zip(self.available_proxies, statuses)))
+    
+    def _apply_health_results(self, health_results: Dict[str, bool]) -> Dict[str, bool]:
+        """Record health check results on the proxy stats and log a summary"""
+        for proxy_name, is_healthy in health_results.items():
+            if proxy_name in self.proxy_stats:
+                self.proxy_stats[proxy_name].set_health(is_healthy)
         
         healthy_count = sum(1 for status in health_results.values() if status)
-        self.logger.info(f"Health check complete: {healthy_count}/{len(health_results)} proxies healthy")
+        self.logger.info("Health check complete: %s/%s proxies healthy", healthy_count, len(health_results))
         
         return health_results
 
-
 def main():
     """Test the proxy manager"""
     import argparse
@@ -520,11 +975,13 @@ def main():
     parser.add_argument('--test-url', default='https://tcgcsv.com/tcgplayer/categories', help='URL to test')
     parser.add_argument('--health-check', action='store_true', help='Run health check on all proxies')
     parser.add_argument('--stats', action='store_true', help='Show proxy statistics')
+    parser.add_argument('--verbose', action='store_true', help='Log proxy switches and selections')
     
     args = parser.parse_args()
     
     # Create proxy manager
-    manager = MihomoProxyManager(api_url=args.api_url, secret=args.secret)
+    manager = MihomoProxyManager(api_url=args.api_url, secret=args.secret,
+                                 log_level=logging.INFO if args.verbose else logging.WARNING)
     
     if args.health_check:
         # Run health check
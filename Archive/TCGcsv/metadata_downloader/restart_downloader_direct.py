@@ -4,9 +4,8 @@ Restart the metadata downloader with direct connection (no proxy switching)
 """
 import subprocess
 import requests
-import json
+import threading
 import time
-import os
 
 def set_proxy_to_direct():
     """Set Mihomo proxy to DIRECT connection"""
@@ -42,13 +41,17 @@ def verify_proxy_setting():
 def start_downloader_in_screen():
     """Start the downloader in a new screen session"""
     try:
-        # Kill any existing screen session
-        try:
-            subprocess.run(["screen", "-S", "tcg_direct", "-X", "quit"], 
-                         capture_output=True, timeout=5)
-            time.sleep(1)
-        except:
-            pass  # Ignore if no existing session
+        # Kill any existing screen session, polling until it is gone
+        # (quit fails once no session with that name remains)
+        for _ in range(10):
+            try:
+                quit_result = subprocess.run(["screen", "-S", "tcg_direct", "-X", "quit"],
+                                             capture_output=True, timeout=5)
+            except Exception:
+                break  # Ignore if screen is unavailable
+            if quit_result.returncode != 0:
+                break
+            time.sleep(0.05)
         
         # Start new screen session with the downloader
         cmd = [
@@ -57,13 +60,25 @@ def start_downloader_in_screen():
             "python3 run_full_categories_exclude_pokemon.py 2>&1 | tee -a tcg_direct_download.log"
         ]
         
-        result = subprocess.run(cmd, capture_output=True, timeout=10)
+        process = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        
+        # screen -dmS detaches almost immediately; returns as soon as it exits
+        try:
+            returncode = process.wait(timeout=0.5)
+        except subprocess.TimeoutExpired:
+            # Still launching: drain stderr and reap it in the background
+            threading.Thread(target=process.communicate).start()
+            print("⏳ Screen session 'tcg_direct' is still starting; check with 'screen -list'")
+            return True
+        
+        stderr = process.stderr.read().decode()
+        process.stderr.close()
         
-        if result.returncode == 0:
+        if returncode == 0:
             print("✅ Started downloader in screen session 'tcg_direct'")
             return True
         else:
-            print(f"❌ Failed to start screen session: {result.stderr.decode()}")
+            print(f"❌ Failed to start screen session: {stderr}")
             return False
             
     except Exception as e:
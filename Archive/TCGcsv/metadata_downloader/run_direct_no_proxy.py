@@ -2,16 +2,160 @@
 """
 Run the full categories downloader WITHOUT proxy manager to avoid switching issues
 """
+import asyncio
 import logging
-import os
-import json
-import requests
-import pandas as pd
+import httpx
+import orjson
 import time
-from datetime import datetime
-from enhanced_api_downloader import EnhancedTCGMetadataDownloader
+from category_cache import CATEGORIES_URL, load_cached_categories, save_cached_categories
+
+# Pre-bound URL builders for the hot request paths
+GROUPS = "https://tcgcsv.com/tcgplayer/{}/groups".format
+PRODUCTS = "https://tcgcsv.com/tcgplayer/{}/{}/products".format
+
+# Categories downloaded at the same time (all share LIMITER)
+CATEGORY_CONCURRENCY = 4
+
+# How many categories' group lists to fetch ahead of the product downloads
+PREFETCH_DEPTH = 2
+
+# Global request budget across all in-flight fetches
+REQUESTS_PER_SECOND = 5.0
+
+# Connection cap; only reached over HTTP/1.1, where each in-flight request needs its own
+HTTP_POOL_SIZE = 20
+
+# httpx negotiates HTTP/2 only with the optional h2 package
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+class AsyncTokenBucket:
+    """Async token bucket shared by every fetch coroutine
+    
+    On a 403 the rate is halved instead of sleeping, and restored after a
+    cool-off, so one rate-limited request never stalls its siblings.
+    """
+    
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.base_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._restore_handle = None
+    
+    async def acquire(self):
+        """Wait until a token is available, then take it"""
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self.last = time.monotonic()
+                self.tokens = 1
+            self.tokens -= 1
+    
+    def backoff(self, restore_after: float = 30.0):
+        """Halve the rate (floor 1 req/s) and schedule a restore"""
+        self.rate = max(1.0, self.rate * 0.5)
+        if self._restore_handle is not None:
+            self._restore_handle.cancel()
+        self._restore_handle = asyncio.get_running_loop().call_later(restore_after, self._restore)
+    
+    def _restore(self):
+        self.rate = self.base_rate
+        self._restore_handle = None
+
+class AdaptiveConcurrency:
+    """AIMD cap on product fetches in flight across all categories
+    
+    The cap grows by one after every `increase_every` consecutive successes
+    and is halved on a 403, so the usable concurrency is discovered live.
+    """
+    
+    def __init__(self, initial: int = 4, minimum: int = 2, maximum: int = 32,
+                 increase_every: int = 20):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase_every = increase_every
+        self.in_flight = 0
+        self._successes = 0
+        self._cond = asyncio.Condition()
+    
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+    
+    async def __aexit__(self, *exc_info):
+        async with self._cond:
+            self.in_flight -= 1
+            # Wake enough waiters to fill the (possibly raised) cap
+            self._cond.notify(max(1, self.limit - self.in_flight))
+    
+    def on_success(self):
+        """Additive increase"""
+        self._successes += 1
+        if self._successes >= self.increase_every:
+            self._successes = 0
+            self.limit = min(self.maximum, self.limit + 1)
+    
+    def on_rate_limited(self):
+        """Multiplicative decrease"""
+        self._successes = 0
+        self.limit = max(self.minimum, self.limit // 2)
+
+LIMITER = AsyncTokenBucket(REQUESTS_PER_SECOND)
+CONCURRENCY = AdaptiveConcurrency()
+
+_encoding_checked = False
+
+def check_content_encoding(response: httpx.Response, logger):
+    """Log, once, whether product payloads actually arrive compressed"""
+    global _encoding_checked
+    if _encoding_checked:
+        return
+    _encoding_checked = True
+    
+    encoding = response.headers.get('content-encoding')
+    wire_bytes = response.num_bytes_downloaded
+    body_bytes = len(response.content)
+    if encoding:
+        logger.info(f"Payload encoding: {encoding} ({wire_bytes:,} bytes on the wire, {body_bytes:,} decoded)")
+    else:
+        logger.warning(f"Payloads are not compressed ({body_bytes:,} bytes); "
+                       f"Accept-Encoding sent: {response.request.headers.get('accept-encoding')}")
+
+async def decode_results(response: httpx.Response) -> list:
+    """Decode a payload's results on a worker thread so large bodies don't block the event loop"""
+    data = await asyncio.get_running_loop().run_in_executor(None, orjson.loads, response.content)
+    return data.get('results', [])
+
+def make_client() -> httpx.AsyncClient:
+    """
+    Pooled client; with h2 installed requests multiplex as HTTP/2 streams
+    
+    The pool keeps room for HTTP/1.1 connections, which httpx only opens
+    when h2 is missing or the server doesn't negotiate HTTP/2; an HTTP/2
+    connection takes every request while it has free streams.
+    """
+    return httpx.AsyncClient(
+        http2=HTTP2_AVAILABLE,
+        limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE,
+                            keepalive_expiry=300),
+        timeout=30.0
+    )
 
 def main():
+    asyncio.run(run())
+
+async def run():
     # Set up logging
     logging.basicConfig(
         level=logging.INFO,
@@ -26,118 +170,170 @@ def main():
     logger.info("Starting TCG Metadata Downloader (Direct Connection, No Proxy Manager)")
     
     try:
-        # Initialize downloader with proxy manager disabled
-        downloader = EnhancedTCGMetadataDownloader(
-            min_request_interval=0.5,  # Faster with direct connection
-            max_request_interval=1.5,
-            backoff_factor=1.0,
-            max_retries=3,
-            use_proxy_manager=False,  # DISABLE proxy manager
-            batch_size=100
-        )
+        async with make_client() as client:
+            await prewarm(client, logger)
+            await process_categories(client, logger)
         
-        logger.info("✅ Downloader initialized without proxy manager")
-        
-        # Get all categories first
+    except Exception as e:
+        logger.error(f"Fatal error: {e}")
+
+async def prewarm(client: httpx.AsyncClient, logger):
+    """Open the TCP/TLS connection to tcgcsv.com before the real requests start"""
+    start = time.monotonic()
+    try:
+        await client.head("https://tcgcsv.com/")
+        logger.info(f"Connection to tcgcsv.com warmed up in {(time.monotonic() - start) * 1000:.0f} ms")
+    except Exception as e:
+        # Not fatal: the first real request will connect instead
+        logger.warning(f"Connection pre-warm failed: {e}")
+
+async def process_categories(client: httpx.AsyncClient, logger):
+    """Fetch the category list and download every non-Pokemon category"""
+    # Get all categories first (from the disk cache when it is fresh)
+    categories = load_cached_categories()
+    if categories is not None:
+        logger.info(f"Found {len(categories)} total categories (cached)")
+    else:
         try:
-            response = requests.get("https://tcgcsv.com/tcgplayer/categories", timeout=30)
+            await LIMITER.acquire()
+            response = await client.get(CATEGORIES_URL)
             response.raise_for_status()
-            categories = response.json().get('results', [])
+            categories = await decode_results(response)
             logger.info(f"Found {len(categories)} total categories")
         except Exception as e:
             logger.error(f"Failed to fetch categories: {e}")
             return
         
-        # Exclude Pokemon categories 
-        excluded_categories = [3, 85]  # Pokemon, Pokemon Japan
-        filtered_categories = [cat for cat in categories 
-                             if cat.get('categoryId', 0) not in excluded_categories]
-        
-        logger.info(f"Processing {len(filtered_categories)} categories (excluding Pokemon variants)")
-        
-        # Process categories
-        total_products = 0
-        for i, category in enumerate(filtered_categories, 1):
+        # A failed cache write must not discard the fetched list
+        if not save_cached_categories(categories):
+            logger.warning("Category list not cached")
+    
+    # Exclude Pokemon categories 
+    excluded_categories = frozenset((3, 85))  # Pokemon, Pokemon Japan
+    filtered_categories = [cat for cat in categories 
+                         if cat.get('categoryId', 0) not in excluded_categories]
+    
+    logger.info(f"Processing {len(filtered_categories)} categories (excluding Pokemon variants)")
+    
+    # Group lists for the next categories are fetched while products download
+    queue = asyncio.Queue(maxsize=PREFETCH_DEPTH)
+    producer = asyncio.create_task(prefetch_groups(client, filtered_categories, queue, logger))
+    
+    # Process categories with a fixed set of workers; progress is logged in completion order
+    total_products = 0
+    started = 0
+    completed = 0
+    
+    async def worker():
+        nonlocal total_products, started, completed
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            category, groups = item
             category_id = category.get('categoryId')
             category_name = category.get('name', 'Unknown')
             
-            logger.info(f"\n=== [{i}/{len(filtered_categories)}] CATEGORY: {category_name} ===")
+            started += 1
+            logger.info(f"\n=== [{started}/{len(filtered_categories)}] CATEGORY: {category_name} ===")
             
             try:
                 # Download this category using the basic method
-                products_added = download_category_simple(category_id, category_name, logger)
+                products_added = await download_category_simple(client, category_id, category_name, logger, groups)
                 total_products += products_added
+                completed += 1
                 
                 logger.info(f"Category {category_name} completed: +{products_added} products")
-                logger.info(f"Progress: {i}/{len(filtered_categories)} categories, {total_products} total products")
+                logger.info(f"Progress: {completed}/{len(filtered_categories)} categories, {total_products} total products")
                 
             except Exception as e:
                 logger.error(f"Category {category_name} failed: {e}")
-                continue
-        
-        logger.info(f"✅ All categories completed! Total products: {total_products}")
-        
-    except Exception as e:
-        logger.error(f"Fatal error: {e}")
+    
+    try:
+        await asyncio.gather(*[worker() for _ in range(CATEGORY_CONCURRENCY)])
+    finally:
+        producer.cancel()
+    
+    logger.info(f"✅ All categories completed! Total products: {total_products}")
 
-def download_category_simple(category_id: int, category_name: str, logger) -> int:
-    """Simple category download without proxy switching"""
+async def prefetch_groups(client: httpx.AsyncClient, categories: list, queue: asyncio.Queue, logger):
+    """Producer: fetch each category's groups ahead of time into the bounded queue"""
+    for category in categories:
+        groups = await fetch_groups(client, category.get('categoryId'), category.get('name', 'Unknown'), logger)
+        await queue.put((category, groups))
     
-    # Get groups for this category
+    # One stop marker per worker
+    for _ in range(CATEGORY_CONCURRENCY):
+        await queue.put(None)
+
+async def fetch_groups(client: httpx.AsyncClient, category_id: int,
+                       category_name: str, logger) -> list:
+    """Get groups for a category, or an empty list on failure"""
     try:
-        response = requests.get(f"https://tcgcsv.com/tcgplayer/{category_id}/groups", timeout=30)
+        await LIMITER.acquire()
+        response = await client.get(GROUPS(category_id))
         if response.status_code == 403:
             logger.warning(f"Rate limited on category {category_id}, skipping...")
-            time.sleep(5)  # Wait longer on rate limit
-            return 0
+            LIMITER.backoff()  # Slow everyone down instead of stalling here
+            CONCURRENCY.on_rate_limited()
+            return []
         
         response.raise_for_status()
-        groups = response.json().get('results', [])
+        groups = await decode_results(response)
         logger.info(f"Found {len(groups)} groups in category {category_name}")
-        
-        if not groups:
-            return 0
+        return groups
             
     except Exception as e:
         logger.error(f"Failed to get groups for category {category_id}: {e}")
+        return []
+
+async def download_category_simple(client: httpx.AsyncClient, category_id: int,
+                                   category_name: str, logger, groups: list = None) -> int:
+    """Simple category download without proxy switching
+    
+    Args:
+        groups: Pre-fetched group list; fetched here when None
+    """
+    if groups is None:
+        groups = await fetch_groups(client, category_id, category_name, logger)
+    
+    if not groups:
         return 0
     
-    # Process each group
-    total_products = 0
-    for j, group in enumerate(groups, 1):
+    # Fetch groups concurrently, bounded by the shared adaptive cap
+    async def fetch(j: int, group: dict) -> int:
         group_id = group.get('groupId')
         group_name = group.get('name', 'Unknown')
         
         if j % 100 == 0:
             logger.info(f"Processing group {j}/{len(groups)}: {group_name}")
         
-        try:
-            # Get products for this group
-            response = requests.get(
-                f"https://tcgcsv.com/tcgplayer/{category_id}/{group_id}/products", 
-                timeout=30
-            )
-            
-            if response.status_code == 403:
-                logger.warning(f"Rate limited on group {group_id}, waiting...")
-                time.sleep(2)  # Brief wait on rate limit
-                continue
-            
-            response.raise_for_status()
-            products = response.json().get('results', [])
-            
-            if products:
-                total_products += len(products)
+        async with CONCURRENCY:
+            try:
+                # Get products for this group
+                await LIMITER.acquire()
+                response = await client.get(PRODUCTS(category_id, group_id))
+                
+                if response.status_code == 403:
+                    logger.warning(f"Rate limited on group {group_id}, backing off...")
+                    LIMITER.backoff()
+                    CONCURRENCY.on_rate_limited()
+                    return 0
+                
+                response.raise_for_status()
+                CONCURRENCY.on_success()
+                check_content_encoding(response, logger)
+                products = await decode_results(response)
+                
                 # Here you would normally save to BigQuery, but for now just count
+                return len(products)
                 
-            # Small delay between requests
-            time.sleep(0.2)
-            
-        except Exception as e:
-            logger.warning(f"Group {group_id} failed: {e}")
-            continue
+            except Exception as e:
+                logger.warning(f"Group {group_id} failed: {e}")
+                return 0
     
-    return total_products
+    counts = await asyncio.gather(*[fetch(j, g) for j, g in enumerate(groups, 1)])
+    return sum(counts)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
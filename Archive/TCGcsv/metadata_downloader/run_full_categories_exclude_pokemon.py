@@ -13,6 +13,7 @@ from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from enhanced_api_downloader import EnhancedTCGMetadataDownloader
+from category_cache import cached_categories
 
 def main():
     print("🃏 FULL TCG METADATA DOWNLOAD (EXCLUDING POKEMON)")
@@ -25,13 +26,11 @@ def main():
     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = '/home/caoliu/TradingCard/TCGcsv/service-account.json'
     
     # Categories to exclude: Pokemon (3) and Pokemon Japan (85)
-    excluded_categories = [3, 85]
+    excluded_categories = frozenset((3, 85))
     
     # Get all categories and filter out Pokemon ones
     try:
-        import requests
-        response = requests.get('https://tcgcsv.com/tcgplayer/categories')
-        all_categories = response.json()['results']
+        all_categories = cached_categories()
         
         # Filter categories to download (exclude Pokemon categories)
         categories_to_download = [
@@ -41,9 +40,8 @@ def main():
         
         print(f"📋 Download Plan:")
         print(f"   Total categories available: {len(all_categories)}")
-        print(f"   Excluded (Pokemon): {excluded_categories}")
+        print(f"   Excluded (Pokemon): {sorted(excluded_categories)}")
         print(f"   Categories to download: {len(categories_to_download)}")
-        print(f"   Category IDs: {categories_to_download}")
         print()
         
         # Initialize enhanced downloader with optimized settings
@@ -51,15 +49,15 @@ def main():
         downloader = EnhancedTCGMetadataDownloader(
             min_request_interval=0.5,  # Slower rate to avoid rate limiting
             batch_size=1000,           # Larger batches for efficiency
-            checkpoint_file="full_categories_checkpoint.json",
+            use_load_jobs=True,        # NDJSON load job per category, no streaming buffer
+            checkpoint_file="full_categories_checkpoint.db",
             log_file="full_categories_download.log",
             use_proxy_manager=False    # DISABLE proxy manager to avoid switching issues
         )
         
         print("✅ Downloader initialized")
-        print(f"⚡ Rate limiting: Pure BigQuery buffering (no artificial delays)")
-        print(f"📦 Batch size: 1000 rows")
-        print(f"💾 Checkpoint: full_categories_checkpoint.json")
+        print(f"📦 BigQuery: one NDJSON load job per category (WRITE_APPEND)")
+        print(f"💾 Checkpoint: full_categories_checkpoint.db")
         print(f"📄 Log file: full_categories_download.log")
         print()
         
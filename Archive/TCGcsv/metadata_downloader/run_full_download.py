@@ -7,8 +7,10 @@ import os
 import sys
 import argparse
 import json
+import mmap
 import subprocess
 import time
+from functools import cached_property
 from datetime import datetime
 from typing import List, Optional, Dict
 from dotenv import load_dotenv
@@ -23,14 +25,37 @@ class ProductionDownloadRunner:
         self.screen_session_name = screen_session_name
         self.log_file = "tcg_full_download.log"
         self.status_file = "download_status.json"
+        self._screen_cache = None  # (monotonic timestamp, session running)
+    
+    @cached_property
+    def _downloader(self) -> EnhancedTCGMetadataDownloader:
+        """Downloader reused across status polls (built on first use)"""
+        return EnhancedTCGMetadataDownloader()
+    
+    @cached_property
+    def _bq_loader(self):
+        """BigQuery loader reused across status polls so its client stays warm"""
+        from bigquery_loader import BigQueryMetadataLoader
+        return BigQueryMetadataLoader()
+        
+    def check_screen_session(self, max_age: float = 1.0) -> bool:
+        """Check if screen session exists
+        
+        Args:
+            max_age: Reuse the last `screen -list` result if it is younger than this (seconds)
+        """
+        now = time.monotonic()
+        if self._screen_cache is not None and now - self._screen_cache[0] < max_age:
+            return self._screen_cache[1]
         
-    def check_screen_session(self) -> bool:
-        """Check if screen session exists"""
         try:
-            result = subprocess.run(['screen', '-list'], capture_output=True, text=True)
-            return self.screen_session_name in result.stdout
+            result = subprocess.run(['screen', '-list'], capture_output=True, text=True, check=False)
+            running = self.screen_session_name in result.stdout
         except:
-            return False
+            running = False
+        
+        self._screen_cache = (now, running)
+        return running
     
     def start_screen_session(self, command: str) -> bool:
         """Start download in screen session"""
@@ -40,6 +65,7 @@ class ProductionDownloadRunner:
                 'bash', '-c', f"{command} 2>&1 | tee {self.log_file}"
             ]
             subprocess.run(screen_cmd, check=True)
+            self._screen_cache = None
             print(f"✅ Started screen session: {self.screen_session_name}")
             return True
         except subprocess.CalledProcessError as e:
@@ -59,6 +85,7 @@ class ProductionDownloadRunner:
         if self.check_screen_session():
             try:
                 subprocess.run(['screen', '-S', self.screen_session_name, '-X', 'quit'], check=True)
+                self._screen_cache = None
                 print(f"✅ Killed screen session: {self.screen_session_name}")
                 return True
             except subprocess.CalledProcessError:
@@ -69,15 +96,30 @@ class ProductionDownloadRunner:
             return True
     
     def show_logs(self, lines: int = 50):
-        """Show recent log entries"""
-        if os.path.exists(self.log_file):
-            os.system(f"tail -{lines} {self.log_file}")
-        else:
+        """Show recent log entries (scans back from EOF, reading only the tail)"""
+        if not os.path.exists(self.log_file):
             print("❌ Log file not found")
+            return
+        
+        with open(self.log_file, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                # A trailing newline ends the last line, it doesn't start a new one
+                pos = len(mm) - 1 if mm[-1] == ord('\n') else len(mm)
+                for _ in range(lines):
+                    pos = mm.rfind(b'\n', 0, pos)
+                    if pos < 0:
+                        break
+                sys.stdout.flush()
+                sys.stdout.buffer.write(mm[pos + 1:])
+                sys.stdout.buffer.flush()
     
     def get_status(self) -> Dict:
         """Get current download status"""
-        downloader = EnhancedTCGMetadataDownloader()
+        downloader = self._downloader
+        # Re-read the checkpoint file; the running download keeps updating it
+        downloader.checkpoint = downloader._load_checkpoint()
         
         status = {
             'timestamp': datetime.now().isoformat(),
@@ -89,8 +131,8 @@ class ProductionDownloadRunner:
         
         # Add BigQuery table info
         try:
-            from bigquery_loader import BigQueryMetadataLoader
-            loader = BigQueryMetadataLoader()
+            loader = self._bq_loader
+            loader.get_table(refresh=True)  # Pick up rows added since the last poll
             table_info = loader.get_table_info()
             status['bigquery'] = table_info
         except Exception as e:
@@ -7,14 +7,55 @@ Fetches and manages proxy subscriptions for automatic switching
 import requests
 import yaml
 import json
+import hashlib
 import os
+import pickle
+import shutil
 import time
-from datetime import datetime, timedelta
+from collections import Counter
 from typing import Dict, List, Any, Optional
 import logging
 
+# libyaml-backed loader/dumper when available, pure-Python fallback otherwise
+try:
+    from yaml import CSafeLoader as _SafeLoader, CSafeDumper as _SafeDumper
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader, SafeDumper as _SafeDumper
+
+# Proxy fields checked by validate_proxies
+_REQUIRED_PROXY_FIELDS = frozenset(('name', 'type', 'server', 'port'))
+_SSR_FIELDS = frozenset(('cipher', 'password', 'protocol'))
+_SS_FIELDS = frozenset(('cipher', 'password'))
+
+# Local-time ISO 8601 to the second, for file timestamps
+ISO_SECONDS_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+
+class _NoAliasDumper(_SafeDumper):
+    """Write shared lists out in full instead of as &anchor/*alias references"""
+    def ignore_aliases(self, data):
+        return True
+
 
 class SubscriptionManager:
+    # Static parts of the enhanced config, shared by every enhance_config call
+    _PROBE_URL = 'https://tcgcsv.com'
+    _FALLBACK_PROXIES = ('auto-switch', 'DIRECT')
+    _MANUAL_SELECT_HEAD = ('auto-switch', 'fallback-group', 'load-balance', 'DIRECT')
+    _RULES_TEMPLATE = (
+        'DOMAIN-SUFFIX,tcgcsv.com,manual-select',
+        'DOMAIN-SUFFIX,api.tcgcsv.com,manual-select',
+        'DOMAIN-KEYWORD,tcg,manual-select',
+        'MATCH,DIRECT'
+    )
+    _EXT_CTRL = {
+        'external-controller': '127.0.0.1:9090',
+        'allow-lan': False,
+        'bind-address': '*',
+        'mode': 'rule',
+        'log-level': 'info'
+    }
+    
     def __init__(self, 
                  subscription_url: str,
                  config_dir: str = "/etc/mihomo",
@@ -50,24 +91,77 @@ class SubscriptionManager:
         
         # Create backup directory
         os.makedirs(self.backup_path, exist_ok=True)
+        
+        # ETag + parsed-config cache for conditional subscription fetches, keyed by URL
+        url_key = hashlib.blake2b(subscription_url.encode('utf-8'), digest_size=16).hexdigest()
+        self.sub_etag_path = os.path.join(config_dir, f".sub-{url_key}.etag")
+        self.sub_cache_path = os.path.join(config_dir, f".sub-{url_key}.pkl")
+        
+        # Last config written by save_config and the file mtime it produced
+        self._last_config = None
+        self._last_mtime = None
+    
+    def _load_cached_subscription(self) -> Optional[Dict[str, Any]]:
+        """Load the parsed subscription saved alongside the stored ETag"""
+        try:
+            with open(self.sub_cache_path, 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"Subscription cache unreadable: {e}")
+            return None
+    
+    def _save_cached_subscription(self, config: Dict[str, Any], etag: Optional[str]):
+        """Store the parsed subscription and its ETag for the next conditional fetch"""
+        if not etag:
+            return
+        try:
+            tmp_path = f"{self.sub_cache_path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(config, f, protocol=5)
+            os.replace(tmp_path, self.sub_cache_path)
+            with open(self.sub_etag_path, 'w') as f:
+                f.write(etag)
+        except OSError as e:
+            self.logger.warning(f"Failed to cache subscription: {e}")
     
     def fetch_subscription(self) -> Dict[str, Any]:
         """
         Fetch subscription configuration from URL
         
+        Sends If-None-Match with the last ETag; on 304 the cached parse is
+        returned without downloading or parsing the YAML again.
+        
         Returns:
             Dict containing parsed YAML configuration
         """
         self.logger.info(f"Fetching subscription from: {self.subscription_url}")
         
+        # Only revalidate when the cached parse is actually usable
+        headers = {}
+        cached_config = None
+        if os.path.exists(self.sub_etag_path):
+            cached_config = self._load_cached_subscription()
+            if cached_config is not None:
+                with open(self.sub_etag_path, 'r') as f:
+                    headers['If-None-Match'] = f.read().strip()
+        
         try:
-            response = requests.get(self.subscription_url, timeout=30)
-            response.raise_for_status()
-            
-            # Parse YAML content
-            config = yaml.safe_load(response.text)
+            with requests.get(self.subscription_url, headers=headers, stream=True, timeout=30) as response:
+                if response.status_code == 304:
+                    self.logger.info(f"Subscription unchanged (304), using cached parse with {len(cached_config.get('proxies', []))} proxies")
+                    return cached_config
+                
+                response.raise_for_status()
+                
+                # Parse YAML straight from the (decompressed) byte stream
+                response.raw.decode_content = True
+                config = yaml.load(response.raw, Loader=_SafeLoader)
+                etag = response.headers.get('ETag')
             self.logger.info(f"Successfully fetched subscription with {len(config.get('proxies', []))} proxies")
             
+            self._save_cached_subscription(config, etag)
             return config
             
         except requests.RequestException as e:
@@ -90,71 +184,46 @@ class SubscriptionManager:
         self.logger.info("Enhancing configuration with proxy groups...")
         
         # Extract proxy names
-        proxy_names = [proxy['name'] for proxy in base_config.get('proxies', [])]
+        # Built once and shared by the groups below (the dumper never mutates it)
+        proxy_names = [proxy['name'] for proxy in base_config.get('proxies', ())]
         
         if not proxy_names:
             self.logger.warning("No proxies found in subscription")
             return base_config
         
+        manual_select = list(self._MANUAL_SELECT_HEAD)
+        manual_select += proxy_names
+        
         # Create enhanced proxy groups with mihomo-supported types
         proxy_groups = [
-            {
-                'name': 'auto-switch',
-                'type': 'url-test',  # Changed from 'urltest' to 'url-test'
-                'proxies': proxy_names.copy(),
-                'url': 'https://tcgcsv.com',
-                'interval': 300,
-                'tolerance': 100
-            },
-            {
-                'name': 'fallback-group',
-                'type': 'fallback',
-                'proxies': ['auto-switch', 'DIRECT'],
-                'url': 'https://tcgcsv.com',
-                'interval': 300
-            },
-            {
-                'name': 'load-balance',
-                'type': 'load-balance',
-                'proxies': proxy_names.copy(),
-                'url': 'https://tcgcsv.com',
-                'interval': 300,
-                'strategy': 'consistent-hashing'
-            },
-            {
-                'name': 'manual-select',
-                'type': 'select',
-                'proxies': ['auto-switch', 'fallback-group', 'load-balance', 'DIRECT'] + proxy_names
-            }
+            # 'url-test' (not 'urltest') is the mihomo spelling
+            self._build_group('auto-switch', 'url-test', proxy_names,
+                              url=self._PROBE_URL, interval=300, tolerance=100),
+            self._build_group('fallback-group', 'fallback', list(self._FALLBACK_PROXIES),
+                              url=self._PROBE_URL, interval=300),
+            self._build_group('load-balance', 'load-balance', proxy_names,
+                              url=self._PROBE_URL, interval=300, strategy='consistent-hashing'),
+            self._build_group('manual-select', 'select', manual_select)
         ]
         
         # Update configuration
         enhanced_config = base_config.copy()
         enhanced_config['proxy-groups'] = proxy_groups
         
-        # Add rules for proxy usage
-        rules = [
-            'DOMAIN-SUFFIX,tcgcsv.com,manual-select',
-            'DOMAIN-SUFFIX,api.tcgcsv.com,manual-select',
-            'DOMAIN-KEYWORD,tcg,manual-select',
-            'MATCH,DIRECT'
-        ]
-        
-        enhanced_config['rules'] = rules
+        # Add rules for proxy usage (a fresh list, callers may edit it)
+        enhanced_config['rules'] = list(self._RULES_TEMPLATE)
         
         # Configure external controller for API access
-        enhanced_config.update({
-            'external-controller': '127.0.0.1:9090',
-            'secret': enhanced_config.get('secret', 'your-secret-key'),
-            'allow-lan': False,
-            'bind-address': '*',
-            'mode': 'rule',
-            'log-level': 'info'
-        })
+        enhanced_config.update(self._EXT_CTRL, secret=enhanced_config.get('secret', 'your-secret-key'))
         
         self.logger.info(f"Enhanced config with {len(proxy_groups)} proxy groups")
         return enhanced_config
     
+    @staticmethod
+    def _build_group(name: str, type_: str, proxies: List[str], **options) -> Dict[str, Any]:
+        """Build one proxy-group entry (name, type, proxies first, then options)"""
+        return {'name': name, 'type': type_, 'proxies': proxies, **options}
+    
     def backup_current_config(self) -> bool:
         """
         Backup current configuration file
@@ -167,12 +236,11 @@ class SubscriptionManager:
             return True
         
         try:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
             backup_filename = f"config_backup_{timestamp}.yaml"
             backup_full_path = os.path.join(self.backup_path, backup_filename)
             
-            with open(self.config_path, 'r') as src, open(backup_full_path, 'w') as dst:
-                dst.write(src.read())
+            shutil.copyfile(self.config_path, backup_full_path)
             
             self.logger.info(f"Config backed up to: {backup_full_path}")
             return True
@@ -195,11 +263,17 @@ class SubscriptionManager:
             # Ensure config directory exists
             os.makedirs(self.config_dir, exist_ok=True)
             
-            # Write configuration
-            with open(self.config_path, 'w') as f:
-                yaml.dump(config, f, default_flow_style=False, allow_unicode=True, indent=2)
+            # Write to a sibling temp file and rename over the live config, so
+            # mihomo never sees a half-written file
+            tmp_path = f"{self.config_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                yaml.dump(config, f, Dumper=_NoAliasDumper, default_flow_style=False, allow_unicode=True, indent=2,
+                          width=10**9, sort_keys=False)
+            os.replace(tmp_path, self.config_path)
             
             self.logger.info(f"Configuration saved to: {self.config_path}")
+            self._last_config = config
+            self._last_mtime = os.path.getmtime(self.config_path)
             
             # Set appropriate permissions
             try:
@@ -231,20 +305,19 @@ class SubscriptionManager:
             errors.append("No proxies found in configuration")
             return errors
         
-        required_fields = {'name', 'type', 'server', 'port'}
-        
         for i, proxy in enumerate(proxies):
-            missing_fields = required_fields - set(proxy.keys())
+            # difference() iterates the dict's keys directly, no per-proxy set
+            missing_fields = _REQUIRED_PROXY_FIELDS.difference(proxy)
             if missing_fields:
-                errors.append(f"Proxy {i}: Missing fields: {missing_fields}")
+                errors.append(f"Proxy {i}: Missing fields: {set(missing_fields)}")
             
             # Type-specific validation
             proxy_type = proxy.get('type', '').lower()
             if proxy_type == 'ssr':
-                if not all(k in proxy for k in ['cipher', 'password', 'protocol']):
+                if not _SSR_FIELDS.issubset(proxy):
                     errors.append(f"Proxy {i}: SSR proxy missing required fields")
             elif proxy_type == 'ss':
-                if not all(k in proxy for k in ['cipher', 'password']):
+                if not _SS_FIELDS.issubset(proxy):
                     errors.append(f"Proxy {i}: Shadowsocks proxy missing required fields")
         
         if errors:
@@ -312,24 +385,26 @@ class SubscriptionManager:
             return {'error': 'Config file not found'}
         
         try:
-            with open(self.config_path, 'r') as f:
-                config = yaml.safe_load(f)
+            mtime = os.path.getmtime(self.config_path)
+            if self._last_config is not None and mtime == self._last_mtime:
+                # File is exactly what we last wrote; skip the re-parse
+                config = self._last_config
+            else:
+                with open(self.config_path, 'r') as f:
+                    config = yaml.load(f, Loader=_SafeLoader)
             
             proxies = config.get('proxies', [])
             proxy_groups = config.get('proxy-groups', [])
             
             # Count by type
-            proxy_types = {}
-            for proxy in proxies:
-                proxy_type = proxy.get('type', 'unknown')
-                proxy_types[proxy_type] = proxy_types.get(proxy_type, 0) + 1
+            proxy_types = dict(Counter(proxy.get('type', 'unknown') for proxy in proxies))
             
             stats = {
                 'total_proxies': len(proxies),
                 'proxy_groups': len(proxy_groups),
                 'proxy_types': proxy_types,
                 'config_path': self.config_path,
-                'last_modified': datetime.fromtimestamp(os.path.getmtime(self.config_path)).isoformat()
+                'last_modified': time.strftime(ISO_SECONDS_FORMAT, time.localtime(mtime))
             }
             
             return stats
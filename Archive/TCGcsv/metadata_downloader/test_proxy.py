@@ -4,13 +4,18 @@ Test proxy configuration with TCG API
 """
 import requests
 import json
+from requests.adapters import HTTPAdapter
 from enhanced_api_downloader import EnhancedTCGMetadataDownloader
 
+# Shared pooled session: connections are kept alive per (proxy, host) across probes
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=8, pool_maxsize=32))
+
 def test_direct_connection():
     """Test direct connection to TCG API"""
     print("Testing direct connection...")
     try:
-        response = requests.get("https://tcgcsv.com/tcgplayer/categories", timeout=10)
+        response = _SESSION.get("https://tcgcsv.com/tcgplayer/categories", timeout=10)
         print(f"Direct connection: {response.status_code}")
         return response.status_code == 200
     except Exception as e:
@@ -25,8 +30,8 @@ def test_proxy_connection():
             'http': 'http://127.0.0.1:20172',
             'https': 'http://127.0.0.1:20172'
         }
-        response = requests.get("https://tcgcsv.com/tcgplayer/categories", 
-                              proxies=proxies, timeout=10)
+        response = _SESSION.get("https://tcgcsv.com/tcgplayer/categories", 
+                                proxies=proxies, timeout=10)
         print(f"Proxy connection: {response.status_code}")
         return response.status_code == 200
     except Exception as e:
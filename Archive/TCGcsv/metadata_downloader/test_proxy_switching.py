@@ -3,12 +3,32 @@
 Test proxy automatic switching functionality
 """
 
-from proxy_manager import MihomoProxyManager
+from proxy_manager import MihomoProxyManager, AIOHTTP_AVAILABLE, _response_from_cache
+import asyncio
 import requests
-import time
 import logging
 
-def main():
+async def probe(manager: MihomoProxyManager, url: str, logger):
+    """Request one URL through the manager, switching proxies on errors"""
+    try:
+        if AIOHTTP_AVAILABLE:
+            response = await manager.make_request_with_auto_switch_async(url, max_switches=2)
+        else:
+            response = await asyncio.to_thread(manager.make_request_with_auto_switch, url, max_switches=2)
+        logger.info(f"✅ {url}: HTTP {response.status_code}, {len(response.content)} bytes")
+    except Exception as e:
+        logger.error(f"❌ {url} failed: {e}")
+
+def test_cached_response_streams():
+    """A response rebuilt from the cache supports the streaming accessors"""
+    entry = (0.0, 200, b'line one\nline two', (('Content-Type', 'text/plain'),), 'utf-8')
+    response = _response_from_cache("https://example.com/", entry)
+    
+    assert b''.join(response.iter_content(chunk_size=4)) == b'line one\nline two'
+    assert list(response.iter_lines()) == [b'line one', b'line two']
+    assert response.text == 'line one\nline two'
+
+async def main():
     """Test proxy switching functionality"""
     
     # Setup logging
@@ -17,12 +37,14 @@ def main():
     
     logger.info("=== Testing Proxy Automatic Switching ===")
     
+    manager = None
     try:
         # Initialize proxy manager
         manager = MihomoProxyManager(
             api_url="http://127.0.0.1:9090",
             secret="",
-            rate_limit_codes=[403, 429, 503, 502, 504]
+            rate_limit_codes=[403, 429, 503, 502, 504],
+            log_level=logging.INFO
         )
         
         logger.info("✅ Proxy Manager initialized")
@@ -43,16 +65,21 @@ def main():
         for proxy_name in available_proxies:
             if proxy_name != current_proxy:
                 logger.info(f"Switching to: {proxy_name}")
-                success = manager.switch_proxy(proxy_name)
+                success = manager.switch_proxy(proxy_name, verify=True)
                 if success:
-                    time.sleep(1)  # Brief pause
-                    new_current = manager.get_current_proxy()
+                    await asyncio.sleep(1)  # Brief pause
+                    new_current = manager.get_current_proxy(refresh=True)
                     logger.info(f"Switch result: {new_current}")
                     break
         
         # Test 2: Health check all proxies
         logger.info("\n=== Test 2: Proxy Health Check ===")
-        health_results = manager.health_check_all_proxies()
+        if AIOHTTP_AVAILABLE:
+            health_results = await manager.health_check_all_proxies_async(max_concurrency=64)
+        else:
+            # Probes run on the manager's thread pool (32 workers, one per pooled API
+            # connection); keep the event loop free meanwhile
+            health_results = await asyncio.to_thread(manager.health_check_all_proxies, max_workers=32)
         
         healthy_count = sum(1 for status in health_results.values() if status)
         total_count = len(health_results)
@@ -71,18 +98,8 @@ def main():
             "https://httpbin.org/user-agent"
         ]
         
-        for url in test_urls:
-            try:
-                logger.info(f"Testing URL: {url}")
-                response = manager.make_request_with_auto_switch(url, max_switches=2)
-                logger.info(f"✅ Success: HTTP {response.status_code}")
-                
-                # Show response size
-                content_length = len(response.text)
-                logger.info(f"Response size: {content_length} bytes")
-                
-            except Exception as e:
-                logger.error(f"❌ Failed: {e}")
+        logger.info(f"Testing {len(test_urls)} URLs concurrently")
+        await asyncio.gather(*(probe(manager, url, logger) for url in test_urls))
         
         # Test 4: Force error handling (simulate rate limit)
         logger.info("\n=== Test 4: Error Handling ===")
@@ -130,6 +147,9 @@ def main():
     except Exception as e:
         logger.error(f"❌ Test failed: {e}")
         raise
+    finally:
+        if manager is not None:
+            await manager.aclose()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file
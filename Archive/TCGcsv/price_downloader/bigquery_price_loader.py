@@ -1,19 +1,253 @@
 #!/usr/bin/env python3
+import atexit
 import os
+import threading
+import uuid
+import numpy as np
 import pandas as pd
+import google.auth
+from google.auth.transport.requests import AuthorizedSession
 from google.cloud import bigquery
 from google.cloud.exceptions import NotFound
+from requests.adapters import HTTPAdapter
 import glob
-from typing import Dict, Any, Optional
+import json
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import chain
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 from datetime import datetime
 
+# pyarrow converts CSV to Parquet without building a DataFrame
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Storage Write API streams rows without load jobs (google-cloud-bigquery-storage)
+try:
+    from google.cloud import bigquery_storage_v1
+    from google.cloud.bigquery_storage_v1 import types as bqs_types, writer as bqs_writer
+    from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+    BQ_STORAGE_AVAILABLE = True
+except ImportError:
+    BQ_STORAGE_AVAILABLE = False
+
+# Rows per CSV chunk, so peak memory is O(chunk) rather than O(file)
+CSV_CHUNK_ROWS = 500_000
+
+# CSV bytes per pyarrow read block when converting to Parquet
+PARQUET_BLOCK_SIZE = 64 << 20
+
+# Repeated dates/ids and low-entropy prices compress several times better
+# under zstd than snappy; level 3 keeps encoding cheap (1 for slow CPUs)
+PARQUET_COMPRESSION = 'zstd'
+PARQUET_COMPRESSION_LEVEL = 3
+
+# Parallel load jobs for backfills; stays under the per-project load job concurrency
+MAX_LOAD_WORKERS = 8
+
+# Keep-alive connections per client; room for every parallel load worker
+HTTP_POOL_SIZE = 2 * MAX_LOAD_WORKERS
+
+# Rows per AppendRows request on the Storage Write API
+STREAM_BATCH_ROWS = 1000
+
+# Natural key of a price row; duplicates on it are dropped before upload
+DEDUPE_KEYS = ['price_date', 'product_id', 'sub_type_name']
+
+# Cluster on the columns the daily extraction filters and orders by
+CLUSTERING_FIELDS = ["category_id", "group_id", "product_id"]
+
+# Partition filter that keeps every date; for whole-table queries under require_partition_filter
+ALL_PARTITIONS = "price_date >= DATE '1970-01-01'"
+
+# Narrow dtypes for the price CSV id/category columns; BigQuery widens them back on load.
+# Prices stay float64: float32 would change the stored FLOAT64 values (12.34 -> 12.34000015...)
+PRICE_CSV_DTYPES = {
+    'product_id': 'Int32',  # nullable: a price entry may lack productId
+    'category_id': 'int32',
+    'group_id': 'int32',
+    'sub_type_name': 'category',  # a handful of distinct values per file
+    'low_price': 'float64',
+    'mid_price': 'float64',
+    'high_price': 'float64',
+    'market_price': 'float64',
+    'direct_low_price': 'float64',
+}
+
+def _arrow_price_schema() -> 'pa.Schema':
+    """Arrow schema matching the BigQuery price table, with narrow integer types"""
+    return pa.schema([
+        ('price_date', pa.date32()),
+        ('product_id', pa.int32()),
+        ('sub_type_name', pa.dictionary(pa.int32(), pa.string())),
+        ('low_price', pa.float64()),
+        ('mid_price', pa.float64()),
+        ('high_price', pa.float64()),
+        ('market_price', pa.float64()),
+        ('direct_low_price', pa.float64()),
+        ('category_id', pa.int32()),
+        ('group_id', pa.int32()),
+        ('update_timestamp', pa.timestamp('us', tz='UTC')),
+    ])
+
+# BigQuery schema for the price table, built once at import; immutable so it can be shared
+_PRICE_SCHEMA = (
+    bigquery.SchemaField("price_date", bigquery.enums.SqlTypeNames.DATE),
+    bigquery.SchemaField("product_id", bigquery.enums.SqlTypeNames.INTEGER),
+    bigquery.SchemaField("sub_type_name", bigquery.enums.SqlTypeNames.STRING),
+    bigquery.SchemaField("low_price", bigquery.enums.SqlTypeNames.FLOAT),
+    bigquery.SchemaField("mid_price", bigquery.enums.SqlTypeNames.FLOAT),
+    bigquery.SchemaField("high_price", bigquery.enums.SqlTypeNames.FLOAT),
+    bigquery.SchemaField("market_price", bigquery.enums.SqlTypeNames.FLOAT),
+    bigquery.SchemaField("direct_low_price", bigquery.enums.SqlTypeNames.FLOAT),
+    bigquery.SchemaField("category_id", bigquery.enums.SqlTypeNames.INTEGER),
+    bigquery.SchemaField("group_id", bigquery.enums.SqlTypeNames.INTEGER),
+    bigquery.SchemaField("update_timestamp", bigquery.enums.SqlTypeNames.TIMESTAMP),
+)
+
+class _KeyDeduper:
+    """
+    Keeps the last occurrence of each natural key across the chunks of one file
+    
+    A first pass over the key columns records the position of each key's
+    last row; the streaming pass then keeps only the rows at those positions,
+    so a later (newer) row wins like drop_duplicates(keep='last').
+    """
+    
+    def __init__(self, key_chunks: Iterable[pd.DataFrame]):
+        # Key hash -> file position of its last row; O(unique keys) memory
+        last = pd.Series(dtype=np.int64)
+        offset = 0
+        for keys in key_chunks:
+            hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+            positions = pd.Series(np.arange(offset, offset + len(hashes)), index=hashes)
+            last = pd.concat([last, positions]) if len(last) else positions
+            last = last[~last.index.duplicated(keep='last')]
+            offset += len(hashes)
+        self.last = last
+        self.offset = 0
+        self.dropped = 0
+    
+    def keep_mask(self, keys: pd.DataFrame) -> np.ndarray:
+        """Boolean mask of rows whose key doesn't appear again later in this file"""
+        hashes = pd.util.hash_pandas_object(keys, index=False).to_numpy()
+        positions = np.arange(self.offset, self.offset + len(hashes))
+        self.offset += len(hashes)
+        mask = self.last.reindex(hashes).to_numpy() == positions
+        self.dropped += int((~mask).sum())
+        return mask
+
+def _parse_price_date(dates: pd.Series) -> np.ndarray:
+    """Parse the price_date column into a flat datetime64[D] array"""
+    # Fixed format skips dateutil; cache parses the single repeated date once;
+    # datetime64[D] keeps a flat buffer instead of datetime.date objects
+    return pd.to_datetime(dates, format='%Y-%m-%d', cache=True).values.astype('datetime64[D]')
+
+def _latest_price_csv(data_dir: str = "data") -> Optional[str]:
+    """
+    Newest tcg_prices_*.csv in data_dir by ctime, or None
+    
+    Filters names during one directory pass. Each matching file still
+    costs one stat call on POSIX, where DirEntry caches only the file type.
+    """
+    try:
+        with os.scandir(data_dir) as it:
+            best = max(
+                (e for e in it if e.name.startswith('tcg_prices_') and e.name.endswith('.csv')),
+                key=lambda e: e.stat().st_ctime,
+                default=None
+            )
+    except FileNotFoundError:
+        return None
+    return best.path if best else None
+
+# One bigquery.Client per project, shared by every loader in the process
+_CLIENT_CACHE: Dict[Optional[str], bigquery.Client] = {}
+_CLIENT_LOCK = threading.Lock()
+
+def _get_client(project_id: Optional[str] = None) -> bigquery.Client:
+    """
+    Return the cached client for project_id, creating it on first use
+    
+    The client gets a pooled HTTP session so parallel loads reuse
+    TCP/TLS connections instead of opening new ones.
+    """
+    with _CLIENT_LOCK:
+        client = _CLIENT_CACHE.get(project_id)
+        if client is None:
+            credentials, default_project = google.auth.default(scopes=bigquery.Client.SCOPE)
+            session = AuthorizedSession(credentials)
+            session.mount("https://", HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+            client = bigquery.Client(project=project_id or default_project, credentials=credentials, _http=session)
+            _CLIENT_CACHE[project_id] = client
+        return client
+
+@atexit.register
+def _close_clients():
+    """Close the cached clients' HTTP sessions on exit"""
+    for client in _CLIENT_CACHE.values():
+        client.close()
+    _CLIENT_CACHE.clear()
+
+def _price_row_proto(schema) -> Tuple['descriptor_pb2.DescriptorProto', type]:
+    """
+    Build the TCGPrice protobuf message for the Storage Write API from the table schema
+    
+    No generated _pb2 module is needed: DATE is days since epoch (int32),
+    TIMESTAMP is microseconds since epoch (int64).
+    
+    Returns:
+        (DescriptorProto for the writer schema, message class)
+    """
+    field_types = {
+        'DATE': descriptor_pb2.FieldDescriptorProto.TYPE_INT32,
+        'INTEGER': descriptor_pb2.FieldDescriptorProto.TYPE_INT64,
+        'FLOAT': descriptor_pb2.FieldDescriptorProto.TYPE_DOUBLE,
+        'STRING': descriptor_pb2.FieldDescriptorProto.TYPE_STRING,
+        'TIMESTAMP': descriptor_pb2.FieldDescriptorProto.TYPE_INT64,
+    }
+    
+    message = descriptor_pb2.DescriptorProto(name="TCGPrice")
+    for number, field in enumerate(schema, 1):
+        message.field.add(
+            name=field.name,
+            number=number,
+            type=field_types[field.field_type],
+            label=descriptor_pb2.FieldDescriptorProto.LABEL_OPTIONAL
+        )
+    
+    file_proto = descriptor_pb2.FileDescriptorProto(name="tcg_price.proto", package="tcg", syntax="proto2")
+    file_proto.message_type.add().CopyFrom(message)
+    pool = descriptor_pool.DescriptorPool()
+    pool.Add(file_proto)
+    descriptor = pool.FindMessageTypeByName("tcg.TCGPrice")
+    
+    if hasattr(message_factory, 'GetMessageClass'):
+        message_class = message_factory.GetMessageClass(descriptor)
+    else:
+        message_class = message_factory.MessageFactory(pool).GetPrototype(descriptor)
+    
+    return message, message_class
+
+def _date_param(price_date: str) -> 'bigquery.ScalarQueryParameter':
+    """Typed @d DATE parameter, so price_date predicates always prune partitions"""
+    return bigquery.ScalarQueryParameter("d", "DATE", price_date)
+
 class BigQueryPriceLoader:
     def __init__(self, project_id: str = None, dataset_id: str = "tcg_data"):
-        self.client = bigquery.Client(project=project_id)
+        self.client = _get_client(project_id)
         self.project_id = project_id or self.client.project
         self.dataset_id = dataset_id
         self.dataset_ref = self.client.dataset(dataset_id)
         self.table_name = "tcg_prices"
+        self._table_cache: Optional[bigquery.Table] = None
+        self._table_ready = False
         
         self.ensure_dataset_exists()
     
@@ -30,54 +264,83 @@ class BigQueryPriceLoader:
     
     def get_price_table_schema(self) -> list:
         """Create BigQuery schema for price table with partitioning optimization"""
-        schema = [
-            bigquery.SchemaField("price_date", bigquery.enums.SqlTypeNames.DATE),
-            bigquery.SchemaField("product_id", bigquery.enums.SqlTypeNames.INTEGER),
-            bigquery.SchemaField("sub_type_name", bigquery.enums.SqlTypeNames.STRING),
-            bigquery.SchemaField("low_price", bigquery.enums.SqlTypeNames.FLOAT),
-            bigquery.SchemaField("mid_price", bigquery.enums.SqlTypeNames.FLOAT),
-            bigquery.SchemaField("high_price", bigquery.enums.SqlTypeNames.FLOAT),
-            bigquery.SchemaField("market_price", bigquery.enums.SqlTypeNames.FLOAT),
-            bigquery.SchemaField("direct_low_price", bigquery.enums.SqlTypeNames.FLOAT),
-            bigquery.SchemaField("category_id", bigquery.enums.SqlTypeNames.INTEGER),
-            bigquery.SchemaField("group_id", bigquery.enums.SqlTypeNames.INTEGER),
-            bigquery.SchemaField("update_timestamp", bigquery.enums.SqlTypeNames.TIMESTAMP),
-        ]
+        return list(_PRICE_SCHEMA)
+    
+    def _get_table(self, refresh: bool = False) -> Optional[bigquery.Table]:
+        """
+        Return the price table, fetching it only on a cache miss or when refresh is set
         
-        return schema
+        Returns:
+            The Table, or None if it doesn't exist
+        """
+        if self._table_cache is None or refresh:
+            try:
+                self._table_cache = self.client.get_table(self.dataset_ref.table(self.table_name))
+            except NotFound:
+                self._table_cache = None
+        return self._table_cache
     
     def table_exists(self) -> bool:
         """Check if the price table already exists"""
-        try:
-            table_ref = self.dataset_ref.table(self.table_name)
-            self.client.get_table(table_ref)
-            return True
-        except NotFound:
-            return False
+        return self._get_table() is not None
     
     def create_price_table(self):
-        """Create the price table with partitioning and clustering"""
-        table_ref = self.dataset_ref.table(self.table_name)
-        
-        table = bigquery.Table(table_ref, schema=self.get_price_table_schema())
+        """Create the price table with partitioning and clustering, if it isn't there yet"""
+        sql_types = {'INTEGER': 'INT64', 'FLOAT': 'FLOAT64'}
+        columns = ",\n            ".join(
+            f"{field.name} {sql_types.get(field.field_type, field.field_type)}" for field in _PRICE_SCHEMA
+        )
         
-        # Partition by price_date for efficient querying
-        table.time_partitioning = bigquery.TimePartitioning(
-            type_=bigquery.TimePartitioningType.DAY,
-            field="price_date"
+        # One idempotent DDL statement: no exists-then-create round trip, no race between loaders
+        query = f"""
+        CREATE TABLE IF NOT EXISTS `{self.project_id}.{self.dataset_id}.{self.table_name}` (
+            {columns}
         )
+        PARTITION BY price_date
+        CLUSTER BY {', '.join(CLUSTERING_FIELDS)}
+        OPTIONS (require_partition_filter = TRUE)
+        """
+        self.client.query(query).result()
+        self._table_ready = True
+        
+        print(f"Ensured partitioned table {self.project_id}.{self.dataset_id}.{self.table_name}")
+        print(f"  - Partitioned by: price_date (daily, filter required)")
+        print(f"  - Clustered by: {', '.join(CLUSTERING_FIELDS)}")
+    
+    def ensure_price_table(self):
+        """Create the price table once per loader; later calls cost nothing"""
+        if not self._table_ready and self._table_cache is None:
+            self.create_price_table()
+    
+    def migrate_table_layout(self):
+        """
+        One-time rewrite of an existing price table onto the current
+        clustering and partition-filter settings
+        
+        Changing clustering_fields in place only affects newly written data,
+        so the table is recreated from itself to recluster the existing rows.
+        """
+        table_id = f"`{self.project_id}.{self.dataset_id}.{self.table_name}`"
+        cluster_by = ", ".join(CLUSTERING_FIELDS)
         
-        # Cluster by product_id for efficient lookups
-        table.clustering_fields = ["product_id"]
+        query = f"""
+        CREATE OR REPLACE TABLE {table_id}
+        PARTITION BY price_date
+        CLUSTER BY {cluster_by}
+        OPTIONS (require_partition_filter = TRUE)
+        AS SELECT * FROM {table_id} WHERE {ALL_PARTITIONS}
+        """
         
-        # Create the table
-        table = self.client.create_table(table)
-        print(f"Created partitioned table {self.project_id}.{self.dataset_id}.{self.table_name}")
-        print(f"  - Partitioned by: price_date (daily)")
-        print(f"  - Clustered by: product_id")
+        print(f"Reclustering {self.table_name} by {cluster_by}...")
+        self.client.query(query).result()
+        self._table_cache = None
+        self._table_ready = True
+        print(f"Migrated {self.table_name} to the new table layout")
     
     def drop_table_if_exists(self):
         """Drop the price table if it exists"""
+        self._table_cache = None
+        self._table_ready = False
         try:
             table_ref = self.dataset_ref.table(self.table_name)
             self.client.delete_table(table_ref)
@@ -87,16 +350,210 @@ class BigQueryPriceLoader:
             print(f"Table {self.table_name} doesn't exist, nothing to drop")
             return False
     
-    def load_price_data(self, csv_path: str = None, price_date: str = None, force_recreate: bool = False) -> bool:
+    def read_price_chunks(self, csv_path: str, dedupe: bool = True) -> Optional[Iterator[pd.DataFrame]]:
+        """
+        Read a price CSV in typed chunks of CSV_CHUNK_ROWS rows
+        
+        Args:
+            csv_path: Price CSV
+            dedupe: Drop rows repeating a (price_date, product_id, sub_type_name) key
+        
+        Returns:
+            Iterator of DataFrame chunks, or None if the CSV has no rows
+        """
+        reader = pd.read_csv(csv_path, chunksize=CSV_CHUNK_ROWS, dtype=PRICE_CSV_DTYPES,
+                             parse_dates=['update_timestamp'])
+        first = next(reader, None)
+        if first is None or first.empty:
+            return None
+        
+        deduper = _KeyDeduper(self._price_key_chunks(csv_path)) if dedupe else None
+        
+        def convert() -> Iterator[pd.DataFrame]:
+            for chunk in chain([first], reader):
+                chunk['price_date'] = _parse_price_date(chunk['price_date'])
+                if deduper is not None:
+                    chunk = chunk[deduper.keep_mask(chunk[DEDUPE_KEYS])]
+                yield chunk
+            if deduper is not None and deduper.dropped:
+                print(f"Dropped {deduper.dropped:,} duplicate records from {csv_path}")
+        
+        return convert()
+    
+    def _price_key_chunks(self, csv_path: str) -> Iterator[pd.DataFrame]:
+        """Natural-key columns of a price CSV, typed exactly as read_price_chunks types them"""
+        key_dtypes = {k: v for k, v in PRICE_CSV_DTYPES.items() if k in DEDUPE_KEYS}
+        for keys in pd.read_csv(csv_path, chunksize=CSV_CHUNK_ROWS, usecols=DEDUPE_KEYS, dtype=key_dtypes):
+            keys['price_date'] = _parse_price_date(keys['price_date'])
+            yield keys[DEDUPE_KEYS]
+    
+    def load_chunks(self, chunks: Iterator[pd.DataFrame], table_ref, job_config: bigquery.LoadJobConfig) -> int:
+        """
+        Spool chunks into one temporary CSV and load it with a single job
+        
+        One job keeps the load atomic (a failure commits nothing, so a retry
+        can't duplicate rows) and needs no pyarrow, unlike load_table_from_dataframe.
+        
+        Returns:
+            Number of rows loaded
+        """
+        columns = [field.name for field in _PRICE_SCHEMA]
+        fd, spool_path = tempfile.mkstemp(prefix='tcg_prices_', suffix='.csv')
+        try:
+            with os.fdopen(fd, 'w', newline='') as f:
+                header = True
+                for chunk in chunks:
+                    chunk.to_csv(f, columns=columns, header=header, index=False)
+                    header = False
+            
+            if header:
+                return 0  # No chunks
+            
+            csv_config = bigquery.LoadJobConfig(
+                schema=job_config.schema,
+                autodetect=False,
+                source_format=bigquery.SourceFormat.CSV,
+                skip_leading_rows=1,
+                write_disposition=job_config.write_disposition,
+                create_disposition=job_config.create_disposition
+            )
+            with open(spool_path, 'rb') as f:
+                job = self.client.load_table_from_file(f, table_ref, job_config=csv_config)
+            job.result()
+            return job.output_rows
+        finally:
+            os.remove(spool_path)
+    
+    def csv_to_parquet(self, csv_path: str, dedupe: bool = True) -> Tuple[str, int]:
+        """
+        Stream a price CSV into a sibling Parquet file, block by block
+        
+        Args:
+            csv_path: Price CSV
+            dedupe: Drop rows repeating a (price_date, product_id, sub_type_name) key
+        
+        Returns:
+            (parquet_path, row_count)
+        """
+        schema = _arrow_price_schema()
+        parquet_path = os.path.splitext(csv_path)[0] + '.parquet'
+        
+        # Timestamps in the CSV are naive; parse them as such and mark them UTC on cast
+        column_types = {field.name: field.type for field in schema}
+        column_types['update_timestamp'] = pa.timestamp('us')
+        
+        def open_reader(columns: Optional[List[str]] = None):
+            return pa_csv.open_csv(
+                csv_path,
+                read_options=pa_csv.ReadOptions(block_size=PARQUET_BLOCK_SIZE),
+                convert_options=pa_csv.ConvertOptions(column_types=column_types,
+                                                      include_columns=columns or [])
+            )
+        
+        deduper = None
+        if dedupe:
+            # Key-only pass, cast exactly as the write pass below casts them
+            key_schema = pa.schema([schema.field(name) for name in DEDUPE_KEYS])
+            deduper = _KeyDeduper(
+                pa.Table.from_batches([batch]).select(DEDUPE_KEYS).cast(key_schema)
+                .to_pandas(date_as_object=False)
+                for batch in open_reader(DEDUPE_KEYS)
+            )
+        
+        reader = open_reader()
+        
+        rows = 0
+        with pq.ParquetWriter(parquet_path, schema, compression=PARQUET_COMPRESSION,
+                              compression_level=PARQUET_COMPRESSION_LEVEL, use_dictionary=True) as writer:
+            for batch in reader:
+                table = pa.Table.from_batches([batch]).select(schema.names).cast(schema)
+                if deduper is not None:
+                    keys = table.select(DEDUPE_KEYS).to_pandas(date_as_object=False)
+                    table = table.filter(pa.array(deduper.keep_mask(keys)))
+                writer.write_table(table)
+                rows += table.num_rows
+        
+        if deduper is not None and deduper.dropped:
+            print(f"Dropped {deduper.dropped:,} duplicate records from {csv_path}")
+        
+        return parquet_path, rows
+    
+    def stage_price_csv(self, csv_path: str, dedupe: bool = True) -> Optional[Tuple[str, Any]]:
+        """
+        Prepare a price CSV for loading
+        
+        Converts to Parquet when pyarrow can; otherwise (or if the CSV doesn't
+        fit the Parquet schema) falls back to the chunked DataFrame reader.
+        
+        Args:
+            csv_path: Price CSV
+            dedupe: Drop rows repeating a (price_date, product_id, sub_type_name) key
+        
+        Returns:
+            ('parquet', path) or ('chunks', iterator), or None if the CSV has no rows
+        """
+        if PYARROW_AVAILABLE:
+            try:
+                parquet_path, rows = self.csv_to_parquet(csv_path, dedupe)
+                if rows == 0:
+                    os.remove(parquet_path)
+                    return None
+                return ('parquet', parquet_path)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+                print(f"Parquet conversion failed, falling back to DataFrame chunks: {e}")
+        
+        chunks = self.read_price_chunks(csv_path, dedupe)
+        return None if chunks is None else ('chunks', chunks)
+    
+    def load_staged(self, staged: Tuple[str, Any], table_ref,
+                    write_disposition: str = bigquery.WriteDisposition.WRITE_APPEND,
+                    create_disposition: str = bigquery.CreateDisposition.CREATE_NEVER) -> int:
+        """
+        Load staged price data into a table
+        
+        Args:
+            staged: Result of stage_price_csv
+            table_ref: Destination table
+            write_disposition: WRITE_APPEND to add rows, WRITE_TRUNCATE to replace a partition or table
+            create_disposition: CREATE_NEVER for the price table (callers ensure it exists),
+                CREATE_IF_NEEDED for staging tables
+        
+        Returns:
+            Number of rows loaded
+        """
+        kind, source = staged
+        
+        # Explicit schema, no autodetect sniffing and no server-side create check
+        job_config = bigquery.LoadJobConfig(
+            schema=_PRICE_SCHEMA,
+            autodetect=False,
+            source_format=bigquery.SourceFormat.PARQUET,
+            write_disposition=write_disposition,
+            create_disposition=create_disposition
+        )
+        
+        if kind == 'parquet':
+            # One load job; BigQuery parallelizes the Parquet ingest server-side
+            try:
+                with open(source, 'rb') as f:
+                    job = self.client.load_table_from_file(f, table_ref, job_config=job_config)
+                job.result()
+                return job.output_rows
+            finally:
+                os.remove(source)
+        
+        return self.load_chunks(source, table_ref, job_config)
+    
+    def load_price_data(self, csv_path: str = None, price_date: str = None, force_recreate: bool = False,
+                        dedupe: bool = True) -> bool:
         """Load price data to BigQuery table with deduplication"""
         
         # Find CSV file if not specified
         if csv_path is None:
-            csv_files = glob.glob(os.path.join("data", "tcg_prices_*.csv"))
-            if not csv_files:
+            csv_path = _latest_price_csv()
+            if csv_path is None:
                 print("No price CSV files found in data directory")
                 return False
-            csv_path = csv_files[-1]  # Use most recent
             print(f"Using CSV file: {csv_path}")
         
         if not os.path.exists(csv_path):
@@ -104,16 +561,12 @@ class BigQueryPriceLoader:
             return False
         
         # Load and validate data
-        df = pd.read_csv(csv_path)
-        if df.empty:
+        staged = self.stage_price_csv(csv_path, dedupe)
+        if staged is None:
             print(f"CSV file is empty: {csv_path}")
             return False
         
-        print(f"Loading {len(df):,} price records from {csv_path}...")
-        
-        # Convert data types
-        df['price_date'] = pd.to_datetime(df['price_date']).dt.date
-        df['update_timestamp'] = pd.to_datetime(df['update_timestamp'])
+        print(f"Loading price records from {csv_path} ({staged[0]})...")
         
         # Handle force recreate
         if force_recreate:
@@ -122,14 +575,7 @@ class BigQueryPriceLoader:
         table_ref = self.dataset_ref.table(self.table_name)
         
         # Create table if it doesn't exist
-        if not self.table_exists():
-            self.create_price_table()
-        
-        # Load data using WRITE_APPEND with deduplication
-        job_config = bigquery.LoadJobConfig(
-            schema=self.get_price_table_schema(),
-            write_disposition=bigquery.WriteDisposition.WRITE_APPEND
-        )
+        self.ensure_price_table()
         
         print(f"Loading data to {self.table_name}...")
         
@@ -140,64 +586,239 @@ class BigQueryPriceLoader:
                 print(f"Warning: Found {existing_data:,} existing records for {price_date}")
                 print("This will create duplicates. Consider using replace_date_data() instead.")
         
-        job = self.client.load_table_from_dataframe(df, table_ref, job_config=job_config)
-        job.result()  # Wait for job to complete
+        loaded_rows = self.load_staged(staged, table_ref)
         
-        table = self.client.get_table(table_ref)
-        print(f"Successfully loaded to {self.project_id}.{self.dataset_id}.{self.table_name}")
+        table = self._get_table(refresh=True)
+        print(f"Successfully loaded {loaded_rows:,} records to {self.project_id}.{self.dataset_id}.{self.table_name}")
         print(f"Table now has {table.num_rows:,} total rows")
         
         return True
     
+    def load_price_data_stream(self, df: pd.DataFrame, stream_type: str = 'PENDING') -> int:
+        """
+        Stream a price DataFrame into the table with the Storage Write API
+        
+        Skips load-job startup latency and the per-table load job quota. With a
+        PENDING stream the rows become visible atomically on commit.
+        
+        Args:
+            df: Price rows, as produced by read_price_chunks
+            stream_type: 'PENDING' (commit all at once) or 'COMMITTED' (visible as appended)
+        
+        Returns:
+            Number of rows written
+        """
+        if not BQ_STORAGE_AVAILABLE:
+            raise ImportError("google-cloud-bigquery-storage is required for streaming loads")
+        
+        self.ensure_price_table()
+        
+        descriptor, message_class = _price_row_proto(_PRICE_SCHEMA)
+        
+        # Proto wants DATE as epoch days and TIMESTAMP as epoch micros
+        rows = df[[field.name for field in _PRICE_SCHEMA]].copy()
+        rows['price_date'] = pd.to_datetime(rows['price_date']).values.astype('datetime64[D]').astype('int64')
+        rows['update_timestamp'] = pd.to_datetime(rows['update_timestamp'], utc=True).values.astype('datetime64[us]').astype('int64')
+        
+        write_client = bigquery_storage_v1.BigQueryWriteClient()
+        parent = write_client.table_path(self.project_id, self.dataset_id, self.table_name)
+        stream = write_client.create_write_stream(
+            parent=parent,
+            write_stream=bqs_types.WriteStream(type_=getattr(bqs_types.WriteStream.Type, stream_type))
+        )
+        
+        # The writer schema rides on the first request only
+        template = bqs_types.AppendRowsRequest(
+            write_stream=stream.name,
+            proto_rows=bqs_types.AppendRowsRequest.ProtoData(
+                writer_schema=bqs_types.ProtoSchema(proto_descriptor=descriptor)
+            )
+        )
+        append_stream = bqs_writer.AppendRowsStream(write_client, template)
+        
+        # Requests are pipelined on the stream; wait for all acks at the end
+        futures = []
+        try:
+            for offset in range(0, len(rows), STREAM_BATCH_ROWS):
+                proto_rows = bqs_types.ProtoRows()
+                for record in rows.iloc[offset:offset + STREAM_BATCH_ROWS].to_dict('records'):
+                    values = {k: v for k, v in record.items() if v is not None and v is not pd.NA and v == v}
+                    proto_rows.serialized_rows.append(message_class(**values).SerializeToString())
+                
+                request = bqs_types.AppendRowsRequest(
+                    offset=offset,
+                    proto_rows=bqs_types.AppendRowsRequest.ProtoData(rows=proto_rows)
+                )
+                futures.append(append_stream.send(request))
+            
+            for future in futures:
+                future.result()
+        finally:
+            append_stream.close()
+        
+        write_client.finalize_write_stream(name=stream.name)
+        
+        if stream_type == 'PENDING':
+            commit = write_client.batch_commit_write_streams(
+                bqs_types.BatchCommitWriteStreamsRequest(parent=parent, write_streams=[stream.name])
+            )
+            if commit.stream_errors:
+                raise RuntimeError(f"Stream commit failed: {commit.stream_errors}")
+        
+        print(f"Streamed {len(rows):,} records to {self.project_id}.{self.dataset_id}.{self.table_name}")
+        return len(rows)
+    
+    def load_many(self, csv_paths: List[str], max_workers: int = MAX_LOAD_WORKERS) -> Dict[str, Any]:
+        """
+        Append several daily price CSVs in parallel, one load job per file
+        
+        Each file is its own date partition, so the jobs don't contend; appends
+        are load jobs, not DML, and don't count against the daily DML quota.
+        
+        Args:
+            csv_paths: Price CSVs to load
+            max_workers: Concurrent load jobs, capped at MAX_LOAD_WORKERS
+        
+        Returns:
+            Dict of csv_path -> rows loaded, or the exception for files that failed
+        """
+        self.ensure_price_table()
+        
+        table_ref = self.dataset_ref.table(self.table_name)
+        
+        def load_one(csv_path: str) -> int:
+            staged = self.stage_price_csv(csv_path)
+            return 0 if staged is None else self.load_staged(staged, table_ref)
+        
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, MAX_LOAD_WORKERS)) as executor:
+            futures = {executor.submit(load_one, path): path for path in csv_paths}
+            for future in as_completed(futures):
+                csv_path = futures[future]
+                try:
+                    results[csv_path] = future.result()
+                    print(f"Loaded {results[csv_path]:,} records from {csv_path}")
+                except Exception as e:
+                    results[csv_path] = e
+                    print(f"Failed to load {csv_path}: {e}")
+        
+        failed = sum(isinstance(r, Exception) for r in results.values())
+        print(f"Backfill finished: {len(results) - failed}/{len(results)} files loaded")
+        self._get_table(refresh=True)
+        return results
+    
     def replace_date_data(self, csv_path: str, price_date: str) -> bool:
-        """Replace data for a specific date (delete + insert)"""
+        """Replace data for a specific date (partition overwrite)"""
         
         if not os.path.exists(csv_path):
             print(f"CSV file not found: {csv_path}")
             return False
         
+        # Create table if it doesn't exist; overwriting a partition of an empty table is a plain load
+        self.ensure_price_table()
+        
         # Load new data
-        df = pd.read_csv(csv_path)
-        if df.empty:
+        staged = self.stage_price_csv(csv_path)
+        if staged is None:
             print(f"CSV file is empty: {csv_path}")
             return False
         
-        df['price_date'] = pd.to_datetime(df['price_date']).dt.date
-        df['update_timestamp'] = pd.to_datetime(df['update_timestamp'])
-        
-        print(f"Replacing data for {price_date} with {len(df):,} records...")
+        print(f"Replacing data for {price_date}...")
         
-        # Create table if it doesn't exist
-        if not self.table_exists():
-            self.create_price_table()
-            return self.load_price_data(csv_path, price_date)
+        # A WRITE_TRUNCATE load into table$YYYYMMDD swaps just that partition:
+        # one load job, no DML and no scan
+        partition_ref = bigquery.TableReference.from_string(
+            f"{self.project_id}.{self.dataset_id}.{self.table_name}${price_date.replace('-', '')}"
+        )
+        loaded_rows = self.load_staged(staged, partition_ref, bigquery.WriteDisposition.WRITE_TRUNCATE)
         
-        table_ref = self.dataset_ref.table(self.table_name)
+        table = self._get_table(refresh=True)
+        print(f"Successfully replaced data for {price_date} with {loaded_rows:,} records")
+        print(f"Table now has {table.num_rows:,} total rows")
         
-        # Delete existing data for this date
-        delete_query = f"""
-        DELETE FROM `{self.project_id}.{self.dataset_id}.{self.table_name}`
-        WHERE price_date = '{price_date}'
+        return True
+    
+    def replace_dates(self, csv_paths: Dict[str, str]) -> bool:
         """
+        Replace several dates at once with a single MERGE
         
-        print(f"Deleting existing data for {price_date}...")
-        delete_job = self.client.query(delete_query)
-        delete_job.result()
+        All files go into one staging table, then one MERGE scoped to the
+        given dates updates, inserts and removes rows: one DML instead of K.
         
-        deleted_rows = delete_job.num_dml_affected_rows
-        print(f"Deleted {deleted_rows:,} existing records for {price_date}")
+        Args:
+            csv_paths: Dict of price_date (YYYY-MM-DD) -> CSV path
         
-        # Insert new data
-        job_config = bigquery.LoadJobConfig(
-            schema=self.get_price_table_schema(),
-            write_disposition=bigquery.WriteDisposition.WRITE_APPEND
-        )
+        Returns:
+            True if the merge ran
+        """
+        if not csv_paths:
+            return False
+        
+        # Merging into a freshly created, empty table just inserts
+        self.ensure_price_table()
+        
+        # Timestamp for readability, uuid so concurrent runs never share a staging table
+        staging_name = (f"{self.table_name}_stg_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+                        f"_{uuid.uuid4().hex[:8]}")
+        staging_ref = self.dataset_ref.table(staging_name)
+        requested = sorted(csv_paths)
         
-        job = self.client.load_table_from_dataframe(df, table_ref, job_config=job_config)
-        job.result()
+        print(f"Replacing data for {len(requested)} dates ({requested[0]} .. {requested[-1]})...")
         
-        table = self.client.get_table(table_ref)
-        print(f"Successfully replaced data for {price_date}")
+        try:
+            staged_rows = 0
+            # Only dates actually staged are merged; the DELETE branch must not
+            # wipe dates whose file was empty
+            dates = []
+            write_disposition = bigquery.WriteDisposition.WRITE_TRUNCATE
+            for price_date in requested:
+                staged = self.stage_price_csv(csv_paths[price_date])
+                if staged is None:
+                    print(f"CSV file is empty: {csv_paths[price_date]}")
+                    continue
+                staged_rows += self.load_staged(staged, staging_ref, write_disposition,
+                                                bigquery.CreateDisposition.CREATE_IF_NEEDED)
+                write_disposition = bigquery.WriteDisposition.WRITE_APPEND
+                dates.append(price_date)
+            
+            if not dates:
+                print("No data staged, nothing to merge")
+                return False
+            print(f"Staged {staged_rows:,} records in {staging_name}")
+            
+            target = f"`{self.project_id}.{self.dataset_id}.{self.table_name}`"
+            source = f"`{self.project_id}.{self.dataset_id}.{staging_name}`"
+            columns = [field.name for field in _PRICE_SCHEMA]
+            update_set = ",\n                ".join(f"{c} = S.{c}" for c in columns)
+            column_list = ", ".join(columns)
+            
+            # The IN UNNEST(@dates) predicates limit the target scan to the replaced partitions;
+            # NOT MATCHED BY SOURCE drops rows for those dates that are gone from the new files
+            merge_query = f"""
+            MERGE {target} T
+            USING {source} S
+            ON T.price_date IN UNNEST(@dates)
+               AND T.price_date = S.price_date
+               AND T.product_id = S.product_id
+               AND T.sub_type_name = S.sub_type_name
+            WHEN MATCHED THEN UPDATE SET
+                {update_set}
+            WHEN NOT MATCHED THEN
+                INSERT ({column_list}) VALUES ({column_list})
+            WHEN NOT MATCHED BY SOURCE AND T.price_date IN UNNEST(@dates) THEN
+                DELETE
+            """
+            
+            job_config = bigquery.QueryJobConfig(query_parameters=[
+                bigquery.ArrayQueryParameter("dates", "DATE", dates)
+            ])
+            merge_job = self.client.query(merge_query, job_config=job_config)
+            merge_job.result()
+            print(f"Merged {merge_job.num_dml_affected_rows:,} records for {len(dates)} dates")
+        finally:
+            self.client.delete_table(staging_ref, not_found_ok=True)
+        
+        table = self._get_table(refresh=True)
         print(f"Table now has {table.num_rows:,} total rows")
         
         return True
@@ -207,16 +828,22 @@ class BigQueryPriceLoader:
         if not self.table_exists():
             return 0
         
+        # Partition metadata carries the row count, so nothing is scanned
         query = f"""
-        SELECT COUNT(*) as record_count
-        FROM `{self.project_id}.{self.dataset_id}.{self.table_name}`
-        WHERE price_date = '{price_date}'
+        SELECT total_rows
+        FROM `{self.project_id}.{self.dataset_id}.INFORMATION_SCHEMA.PARTITIONS`
+        WHERE table_name = @table
+          AND partition_id = FORMAT_DATE('%Y%m%d', @d)
         """
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter("table", "STRING", self.table_name),
+            _date_param(price_date),
+        ])
         
         try:
-            result = self.client.query(query).result()
+            result = self.client.query(query, job_config=job_config).result()
             for row in result:
-                return row.record_count
+                return row.total_rows or 0
         except Exception as e:
             print(f"Error checking existing data: {e}")
             return 0
@@ -226,8 +853,9 @@ class BigQueryPriceLoader:
     def query_table_info(self):
         """Display information about the price table"""
         try:
-            table_ref = self.dataset_ref.table(self.table_name)
-            table = self.client.get_table(table_ref)
+            table = self._get_table(refresh=True)
+            if table is None:
+                raise NotFound(self.table_name)
             
             print(f"\nTable: {self.project_id}.{self.dataset_id}.{self.table_name}")
             print(f"  Rows: {table.num_rows:,}")
@@ -240,42 +868,76 @@ class BigQueryPriceLoader:
             print(f"Table {self.table_name} not found in dataset {self.dataset_id}")
     
     def run_sample_queries(self):
-        """Run sample queries to verify price data"""
+        """Run sample queries to verify price data (one job, tagged result rows)"""
         if not self.table_exists():
             print("Price table doesn't exist yet")
             return
         
-        queries = [
-            ("Total records", f"SELECT COUNT(*) as total_records FROM `{self.table_name}`"),
-            ("Date range", f"SELECT MIN(price_date) as earliest_date, MAX(price_date) as latest_date FROM `{self.table_name}`"),
-            ("Unique products", f"SELECT COUNT(DISTINCT product_id) as unique_products FROM `{self.table_name}`"),
-            ("Categories and groups", f"SELECT COUNT(DISTINCT category_id) as categories, COUNT(DISTINCT group_id) as group_count FROM `{self.table_name}`"),
-            ("Sample records", f"SELECT price_date, product_id, sub_type_name, market_price, category_id, group_id FROM `{self.table_name}` WHERE market_price IS NOT NULL ORDER BY market_price DESC LIMIT 3"),
-        ]
+        table_id = f"`{self.project_id}.{self.dataset_id}.{self.table_name}`"
+        query = f"""
+        WITH stats AS (
+            SELECT
+                COUNT(*) AS total_records,
+                MIN(price_date) AS earliest_date,
+                MAX(price_date) AS latest_date,
+                COUNT(DISTINCT product_id) AS unique_products,
+                COUNT(DISTINCT category_id) AS categories,
+                COUNT(DISTINCT group_id) AS group_count
+            FROM {table_id}
+            WHERE {ALL_PARTITIONS}
+        )
+        SELECT 'stats' AS kind, TO_JSON_STRING(stats) AS payload, 0 AS rank FROM stats
+        UNION ALL
+        SELECT 'sample', TO_JSON_STRING(t), ROW_NUMBER() OVER (ORDER BY t.market_price DESC)
+        FROM (
+            SELECT price_date, product_id, sub_type_name, market_price, category_id, group_id
+            FROM {table_id}
+            WHERE {ALL_PARTITIONS} AND market_price IS NOT NULL
+            ORDER BY market_price DESC
+            LIMIT 3
+        ) t
+        ORDER BY rank
+        """
         
-        for query_name, query in queries:
-            try:
-                full_query = query.replace(f"`{self.table_name}`", f"`{self.project_id}.{self.dataset_id}.{self.table_name}`")
-                result = self.client.query(full_query).result()
-                
-                print(f"\n{query_name}:")
-                for row in result:
-                    print(f"  {dict(row)}")
-            except Exception as e:
-                print(f"Error running {query_name}: {e}")
-    
-    def get_daily_price_query(self, target_date: str) -> str:
-        """Return query to get all prices for a specific date"""
-        return f"""
+        try:
+            result = self.client.query(query).result()
+        except Exception as e:
+            print(f"Error running sample queries: {e}")
+            return
+        
+        for row in result:
+            payload = json.loads(row.payload)
+            if row.kind == 'stats':
+                print("\nTable stats:")
+                for key, value in payload.items():
+                    print(f"  {key}: {value}")
+                print("\nSample records:")
+            else:
+                print(f"  {payload}")
+    
+    def get_daily_price_query(self, target_date: str) -> Tuple[str, List[bigquery.ScalarQueryParameter]]:
+        """
+        Return query to get all prices for a specific date
+        
+        Returns:
+            (sql, query_parameters) for bigquery.QueryJobConfig
+        """
+        sql = f"""
         SELECT *
         FROM `{self.project_id}.{self.dataset_id}.{self.table_name}`
-        WHERE price_date = '{target_date}'
+        WHERE price_date = @d
         ORDER BY category_id, group_id, product_id, sub_type_name
         """
+        return sql, [_date_param(target_date)]
     
-    def get_price_trends_query(self, product_id: int, days: int = 7) -> str:
-        """Return query to get price trends for a product over time"""
-        return f"""
+    def get_price_trends_query(self, product_id: int, days: int = 7) -> Tuple[str, List[bigquery.ScalarQueryParameter]]:
+        """
+        Return query to get price trends for a product over time
+        
+        Returns:
+            (sql, query_parameters) for bigquery.QueryJobConfig
+        """
+        sql = f"""
         SELECT 
             price_date,
             sub_type_name,
@@ -283,18 +945,24 @@ class BigQueryPriceLoader:
             market_price,
             high_price
         FROM `{self.project_id}.{self.dataset_id}.{self.table_name}`
-        WHERE product_id = {product_id}
-            AND price_date >= DATE_SUB(CURRENT_DATE(), INTERVAL {days} DAY)
+        WHERE product_id = @pid
+            AND price_date >= DATE_SUB(CURRENT_DATE(), INTERVAL @days DAY)
         ORDER BY price_date DESC, sub_type_name
         """
+        return sql, [
+            bigquery.ScalarQueryParameter("pid", "INT64", product_id),
+            bigquery.ScalarQueryParameter("days", "INT64", days),
+        ]
 
 if __name__ == "__main__":
     loader = BigQueryPriceLoader()
     
     # Test loading most recent price file
-    csv_files = glob.glob(os.path.join("data", "tcg_prices_*.csv"))
-    if csv_files:
-        latest_csv = max(csv_files, key=os.path.getctime)
+    latest_csv = _latest_price_csv()
+    if latest_csv and "--backfill" in sys.argv:
+        loader.load_many(sorted(glob.glob(os.path.join("data", "tcg_prices_*.csv"))))
+        loader.query_table_info()
+    elif latest_csv:
         print(f"Testing with: {latest_csv}")
         
         success = loader.load_price_data(latest_csv, force_recreate=True)
@@ -3,15 +3,88 @@
 Failure analysis and recovery recommendations for the robust price logger
 Provides detailed failure reporting, pattern analysis, and automated recovery suggestions
 """
+import atexit
+import functools
 import json
 import os
+import threading
+import time
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional, Tuple
-from collections import defaultdict, Counter
-from dataclasses import dataclass
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+from collections import defaultdict
+from dataclasses import dataclass, field
 import logging
 
+# orjson serializes/parses several times faster than stdlib json; fall back if missing
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+def _dumps(obj: Any, indent: bool = False) -> str:
+    """Serialize to a JSON string, compact by default or indented by 2"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0).decode()
+    if indent:
+        return json.dumps(obj, indent=2)
+    return json.dumps(obj, separators=(',', ':'))
+
+_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+# fdatasync skips the metadata flush; not available on macOS
+_datasync = getattr(os, 'fdatasync', os.fsync)
+
+# ijson walks legacy JSON-array failure files one record at a time
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+# Error-key rules in priority order: (key, case-sensitive needles, case-insensitive needles)
+_ERROR_KEY_RULES = (
+    ("connection_error", ("Connection",), ("timeout",)),
+    ("file_not_found", ("404", "Not Found"), ()),
+    ("permission_error", ("Permission", "Forbidden"), ()),
+    ("memory_error", ("Memory",), ()),
+    ("extraction_error", ("7z",), ("extract",)),
+    ("bigquery_error", ("BigQuery", "GCP"), ()),
+)
+
+# pyahocorasick matches every needle in one pass over the message
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+def _build_error_automata() -> Tuple['ahocorasick.Automaton', 'ahocorasick.Automaton']:
+    """Compile the rule needles into (case-sensitive, lowercase) automata valued (priority, key)"""
+    sensitive, insensitive = ahocorasick.Automaton(), ahocorasick.Automaton()
+    for priority, (key, case_sensitive, case_insensitive) in enumerate(_ERROR_KEY_RULES):
+        for needle in case_sensitive:
+            sensitive.add_word(needle, (priority, key))
+        for needle in case_insensitive:
+            insensitive.add_word(needle, (priority, key))
+    sensitive.make_automaton()
+    insensitive.make_automaton()
+    return sensitive, insensitive
+
+if AHOCORASICK_AVAILABLE:
+    _SENSITIVE_AC, _INSENSITIVE_AC = _build_error_automata()
+
+def _count_lines(path: str, chunk_size: int = 1 << 20) -> int:
+    """Count lines by scanning 1 MB binary chunks for newlines (a final unterminated line counts)"""
+    lines = 0
+    last = b'\n'
+    with open(path, 'rb', buffering=0) as f:
+        while chunk := f.read(chunk_size):
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    return lines + (last != b'\n')
+
 @dataclass
 class FailureRecord:
     """Represents a single failure incident"""
@@ -49,6 +122,9 @@ class FailureRecord:
             context=data.get('context', {})
         )
 
+# Sort order for pattern severities, most severe highest
+SEVERITY_RANK = {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}
+
 @dataclass
 class FailurePattern:
     """Represents a pattern of failures"""
@@ -58,6 +134,10 @@ class FailurePattern:
     common_error: str
     recovery_recommendation: str
     severity: str  # 'low', 'medium', 'high', 'critical'
+    rank: int = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.rank = SEVERITY_RANK[self.severity]
 
 class FailureAnalyzer:
     """Analyzes failures and provides recovery recommendations"""
@@ -67,12 +147,32 @@ class FailureAnalyzer:
         self.logger = logging.getLogger(__name__)
         self.failures: List[FailureRecord] = []
         
+        # analyze_patterns result, valid while _failures_version is unchanged
+        self._failures_version = 0
+        self._patterns_cache: Optional[Tuple[int, List[FailurePattern]]] = None
+        self._aggregate_cache: Optional[Tuple[int, Dict[str, Any]]] = None
+        self._df_cache: Optional[Tuple[int, pd.DataFrame]] = None
+        
+        # Failure records waiting to be written, as (failure_file, json_line)
+        self._buffer: List[Tuple[str, str]] = []
+        self._buffer_max = 64
+        self._flush_interval = 5.0  # seconds
+        self._last_flush = time.monotonic()
+        self._buffer_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # serializes writers (caller and timer)
+        self._flush_timer: Optional[threading.Timer] = None
+        atexit.register(self.flush)
+        
+        # Last formatted timestamp, reused for failures recorded in the same second
+        self._ts_second = -1
+        self._ts_iso = ''
+        
     def record_failure(self, date: str, failure_type: str, error: Exception, 
                       retry_count: int = 0, context: Dict[str, Any] = None) -> FailureRecord:
         """Record a failure incident"""
         failure = FailureRecord(
             date=date,
-            timestamp=datetime.now().isoformat(),
+            timestamp=self._timestamp(),
             failure_type=failure_type,
             error_message=str(error),
             error_code=getattr(error, 'errno', None),
@@ -81,47 +181,106 @@ class FailureAnalyzer:
         )
         
         self.failures.append(failure)
+        self._failures_version += 1
         self._save_failure_to_disk(failure)
         
         return failure
     
+    def _timestamp(self) -> str:
+        """Local ISO timestamp at second resolution, formatted once per second"""
+        second = int(time.time())
+        if second != self._ts_second:
+            self._ts_iso = time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(second))
+            self._ts_second = second
+        return self._ts_iso
+    
     def _save_failure_to_disk(self, failure: FailureRecord):
-        """Save failure record to disk for persistence"""
+        """Queue failure record for the date's JSONL log; flushed every N records or T seconds"""
         failure_file = self.config.get_failure_log_filename(failure.date)
-        
-        # Load existing failures for this date
-        existing_failures = []
-        if os.path.exists(failure_file):
+        line = _dumps(failure.to_dict()) + '\n'
+        
+        with self._buffer_lock:
+            self._buffer.append((failure_file, line))
+            due = (len(self._buffer) >= self._buffer_max or
+                   time.monotonic() - self._last_flush >= self._flush_interval)
+            if not due and self._flush_timer is None:
+                # A lone failure must still reach disk within T seconds
+                self._flush_timer = threading.Timer(self._flush_interval, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        
+        if due:
+            self.flush()
+    
+    def flush(self):
+        """Write all buffered failure records, one durable append per failure file"""
+        with self._flush_lock:
+            self._flush()
+    
+    def _flush(self):
+        """Drain the buffer and cancel the pending timer; caller holds _flush_lock"""
+        with self._buffer_lock:
+            buffered, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+        
+        if not buffered:
+            return
+        
+        lines_by_file = defaultdict(list)
+        for failure_file, line in buffered:
+            lines_by_file[failure_file].append(line)
+        
+        for failure_file, lines in lines_by_file.items():
             try:
-                with open(failure_file, 'r') as f:
-                    existing_failures = json.load(f)
+                with open(failure_file, 'a') as f:
+                    f.writelines(lines)
+                    f.flush()
+                    try:
+                        _datasync(f.fileno())
+                    except OSError as e:
+                        # A failed fsync can drop the dirty pages and succeed on retry
+                        # without persisting anything; treat it as fatal, like a WAL
+                        self.logger.critical(f"fsync of {failure_file} failed, records may be lost: {e}")
+                        os._exit(1)
             except Exception as e:
-                self.logger.warning(f"Could not load existing failures: {e}")
-        
-        # Add new failure
-        existing_failures.append(failure.to_dict())
+                self.logger.error(f"Could not save {len(lines)} failure records: {e}")
+    
+    @staticmethod
+    def _read_failure_file(filepath: str) -> Iterator[Dict[str, Any]]:
+        """Yield the records of one failure log (JSONL, or a legacy JSON array) one at a time"""
+        if filepath.endswith('.json'):
+            with open(filepath, 'rb') as f:
+                if IJSON_AVAILABLE:
+                    yield from ijson.items(f, 'item', use_float=True)
+                else:
+                    yield from _loads(f.read())
+            return
         
-        # Save back to disk
-        try:
-            with open(failure_file, 'w') as f:
-                json.dump(existing_failures, f, indent=2)
-        except Exception as e:
-            self.logger.error(f"Could not save failure record: {e}")
+        with open(filepath, 'r') as f:
+            for line in f:
+                if line.strip():
+                    yield _loads(line)
     
     def load_all_failures(self) -> List[FailureRecord]:
         """Load all failure records from disk"""
+        self.flush()
+        
         all_failures = []
         failures_dir = self.config.directories.failures_path
         
-        if not os.path.exists(failures_dir):
+        try:
+            entries = list(os.scandir(failures_dir))
+        except FileNotFoundError:
             return all_failures
         
-        for filename in os.listdir(failures_dir):
-            if filename.startswith('failures_') and filename.endswith('.json'):
-                filepath = os.path.join(failures_dir, filename)
+        for entry in entries:
+            if entry.name.startswith('failures_') and entry.name.endswith(('.jsonl', '.json')) and entry.is_file():
+                filepath = entry.path
                 try:
-                    with open(filepath, 'r') as f:
-                        failures_data = json.load(f)
+                    failures_data = self._read_failure_file(filepath)
                     
                     for failure_dict in failures_data:
                         failure = FailureRecord.from_dict(failure_dict)
@@ -131,6 +290,7 @@ class FailureAnalyzer:
                     self.logger.warning(f"Could not load failures from {filepath}: {e}")
         
         self.failures = all_failures
+        self._failures_version += 1
         return all_failures
     
     def analyze_patterns(self) -> List[FailurePattern]:
@@ -138,65 +298,113 @@ class FailureAnalyzer:
         if not self.failures:
             self.load_all_failures()
         
-        patterns = []
+        if self._patterns_cache is not None and self._patterns_cache[0] == self._failures_version:
+            return list(self._patterns_cache[1])
         
-        # Group failures by type
-        failures_by_type = defaultdict(list)
-        for failure in self.failures:
-            failures_by_type[failure.failure_type].append(failure)
+        aggregate = self._aggregate()
+        patterns = []
         
         # Analyze each failure type
-        for failure_type, type_failures in failures_by_type.items():
-            pattern = self._analyze_failure_type(failure_type, type_failures)
+        for failure_type in aggregate['type_counts'].index:
+            pattern = self._analyze_failure_type(failure_type, aggregate)
             if pattern:
                 patterns.append(pattern)
         
         # Analyze temporal patterns
-        temporal_pattern = self._analyze_temporal_patterns()
+        temporal_pattern = self._analyze_temporal_patterns(aggregate)
         if temporal_pattern:
             patterns.append(temporal_pattern)
         
         # Analyze error message patterns
-        error_patterns = self._analyze_error_patterns()
+        error_patterns = self._analyze_error_patterns(aggregate)
         patterns.extend(error_patterns)
         
-        return patterns
+        self._patterns_cache = (self._failures_version, patterns)
+        return list(patterns)
+    
+    def _failures_frame(self) -> pd.DataFrame:
+        """
+        Columnar view of self.failures, rebuilt only when the failures change
+        
+        Low-cardinality columns are categoricals, so groupbys run over small
+        integer codes instead of walking FailureRecord objects.
+        """
+        if self._df_cache is not None and self._df_cache[0] == self._failures_version:
+            return self._df_cache[1]
+        
+        df = pd.DataFrame({
+            'failure_type': [f.failure_type for f in self.failures],
+            'date': [f.date for f in self.failures],
+            'error_message': [f.error_message for f in self.failures],
+        }, dtype='category')
+        # Classify each distinct message once, not once per failure
+        df['error_key'] = df['error_message'].map(self._extract_error_key).astype('category')
+        
+        self._df_cache = (self._failures_version, df)
+        return df
+    
+    def _aggregate(self) -> Dict[str, Any]:
+        """
+        Group the failures by type, date and error key with vectorized groupbys
+        
+        Returns:
+            Dict of pandas Series keyed by failure type, date and error key
+            (groups in order of first appearance)
+        """
+        if self._aggregate_cache is not None and self._aggregate_cache[0] == self._failures_version:
+            return self._aggregate_cache[1]
+        
+        df = self._failures_frame()
+        by_type = df.groupby('failure_type', sort=False, observed=True)
+        by_error_key = df.groupby('error_key', sort=False, observed=True)
+        
+        # Most frequent message per type; idxmax keeps the first-seen message on ties
+        type_error_counts = df.groupby(['failure_type', 'error_message'], sort=False, observed=True).size()
+        type_top_error = type_error_counts.groupby(level='failure_type', sort=False, observed=True).idxmax().str[1]
+        
+        aggregate = {
+            'type_counts': by_type.size(),
+            'type_dates': by_type['date'].unique(),
+            'type_top_error': type_top_error,
+            'date_counts': df.groupby('date', sort=False, observed=True).size(),
+            'error_key_counts': by_error_key.size(),
+            'error_key_dates': by_error_key['date'].unique(),
+        }
+        self._aggregate_cache = (self._failures_version, aggregate)
+        return aggregate
     
-    def _analyze_failure_type(self, failure_type: str, failures: List[FailureRecord]) -> Optional[FailurePattern]:
+    def _analyze_failure_type(self, failure_type: str, aggregate: Dict[str, Any]) -> Optional[FailurePattern]:
         """Analyze failures of a specific type"""
-        if len(failures) < 2:
+        frequency = int(aggregate['type_counts'][failure_type])
+        if frequency < 2:
             return None
         
-        dates_affected = list(set(f.date for f in failures))
-        most_common_error = Counter(f.error_message for f in failures).most_common(1)[0][0]
+        dates_affected = list(aggregate['type_dates'][failure_type])
+        most_common_error = aggregate['type_top_error'][failure_type]
         
         # Determine severity based on frequency and type
-        severity = self._determine_severity(failure_type, len(failures), len(dates_affected))
+        severity = self._determine_severity(failure_type, frequency, len(dates_affected))
         
         # Generate recovery recommendation
         recommendation = self._get_recovery_recommendation(failure_type, most_common_error)
         
         return FailurePattern(
             pattern_type=f"{failure_type}_failures",
-            frequency=len(failures),
+            frequency=frequency,
             dates_affected=dates_affected,
             common_error=most_common_error,
             recovery_recommendation=recommendation,
             severity=severity
         )
     
-    def _analyze_temporal_patterns(self) -> Optional[FailurePattern]:
+    def _analyze_temporal_patterns(self, aggregate: Dict[str, Any]) -> Optional[FailurePattern]:
         """Analyze temporal patterns in failures"""
         if not self.failures:
             return None
         
-        # Group failures by date
-        failures_by_date = defaultdict(list)
-        for failure in self.failures:
-            failures_by_date[failure.date].append(failure)
-        
         # Find dates with multiple failures
-        problematic_dates = [date for date, failures in failures_by_date.items() if len(failures) > 2]
+        date_counts = aggregate['date_counts']
+        problematic_dates = date_counts[date_counts > 2].index.tolist()
         
         if len(problematic_dates) < 2:
             return None
@@ -210,25 +418,18 @@ class FailureAnalyzer:
             severity="medium" if len(problematic_dates) < 5 else "high"
         )
     
-    def _analyze_error_patterns(self) -> List[FailurePattern]:
+    def _analyze_error_patterns(self, aggregate: Dict[str, Any]) -> List[FailurePattern]:
         """Analyze patterns in error messages"""
         patterns = []
         
-        # Group by similar error messages
-        error_groups = defaultdict(list)
-        for failure in self.failures:
-            # Extract key error indicators
-            error_key = self._extract_error_key(failure.error_message)
-            error_groups[error_key].append(failure)
-        
-        for error_key, failures in error_groups.items():
-            if len(failures) >= 3:  # At least 3 similar errors
-                dates_affected = list(set(f.date for f in failures))
-                severity = "high" if len(failures) > 10 else "medium"
+        for error_key, frequency in aggregate['error_key_counts'].items():
+            if frequency >= 3:  # At least 3 similar errors
+                dates_affected = list(aggregate['error_key_dates'][error_key])
+                severity = "high" if frequency > 10 else "medium"
                 
                 pattern = FailurePattern(
                     pattern_type="error_pattern",
-                    frequency=len(failures),
+                    frequency=int(frequency),
                     dates_affected=dates_affected,
                     common_error=error_key,
                     recovery_recommendation=self._get_error_specific_recommendation(error_key),
@@ -238,25 +439,27 @@ class FailureAnalyzer:
         
         return patterns
     
-    def _extract_error_key(self, error_message: str) -> str:
+    @staticmethod
+    @functools.lru_cache(maxsize=4096)
+    def _extract_error_key(error_message: str) -> str:
         """Extract key identifying information from error message"""
-        # Common error patterns
-        if "Connection" in error_message or "timeout" in error_message.lower():
-            return "connection_error"
-        elif "404" in error_message or "Not Found" in error_message:
-            return "file_not_found"
-        elif "Permission" in error_message or "Forbidden" in error_message:
-            return "permission_error"
-        elif "Memory" in error_message or "MemoryError" in error_message:
-            return "memory_error"
-        elif "7z" in error_message or "extract" in error_message.lower():
-            return "extraction_error"
-        elif "BigQuery" in error_message or "GCP" in error_message:
-            return "bigquery_error"
+        lowered = error_message.lower()
+        
+        # Common error patterns; the earliest rule that matches wins
+        if AHOCORASICK_AVAILABLE:
+            matches = [value for _, value in _SENSITIVE_AC.iter(error_message)]
+            matches.extend(value for _, value in _INSENSITIVE_AC.iter(lowered))
+            if matches:
+                return min(matches)[1]
         else:
-            # Use first few words as key
-            words = error_message.split()[:3]
-            return "_".join(words).lower()
+            for key, case_sensitive, case_insensitive in _ERROR_KEY_RULES:
+                if (any(needle in error_message for needle in case_sensitive) or
+                        any(needle in lowered for needle in case_insensitive)):
+                    return key
+        
+        # Use first few words as key
+        words = error_message.split()[:3]
+        return "_".join(words).lower()
     
     def _determine_severity(self, failure_type: str, frequency: int, dates_affected: int) -> str:
         """Determine severity of failure pattern"""
@@ -309,16 +512,15 @@ class FailureAnalyzer:
         """Generate comprehensive recovery report"""
         patterns = self.analyze_patterns()
         
+        aggregate = self._aggregate()
+        
         # Statistics
         total_failures = len(self.failures)
-        unique_dates = len(set(f.date for f in self.failures))
-        failure_types = Counter(f.failure_type for f in self.failures)
+        unique_dates = len(aggregate['date_counts'])
+        failure_types = {t: int(n) for t, n in aggregate['type_counts'].items()}
         
         # Prioritized recommendations
-        prioritized_patterns = sorted(patterns, key=lambda p: (
-            {'critical': 4, 'high': 3, 'medium': 2, 'low': 1}[p.severity],
-            p.frequency
-        ), reverse=True)
+        prioritized_patterns = sorted(patterns, key=lambda p: (p.rank, p.frequency), reverse=True)
         
         # Recovery strategy
         recovery_strategy = self._generate_recovery_strategy(prioritized_patterns)
@@ -327,7 +529,7 @@ class FailureAnalyzer:
             "summary": {
                 "total_failures": total_failures,
                 "unique_dates_affected": unique_dates,
-                "failure_types": dict(failure_types),
+                "failure_types": failure_types,
                 "report_generated": datetime.now().isoformat()
             },
             "patterns": [
@@ -342,7 +544,7 @@ class FailureAnalyzer:
                 for p in prioritized_patterns
             ],
             "recovery_strategy": recovery_strategy,
-            "failed_dates": sorted(list(set(f.date for f in self.failures))),
+            "failed_dates": sorted(aggregate['date_counts'].index),
             "next_actions": self._get_immediate_actions(prioritized_patterns)
         }
         
@@ -411,7 +613,7 @@ class FailureAnalyzer:
         try:
             report = self.generate_recovery_report()
             with open(report_path, 'w') as f:
-                json.dump(report, f, indent=2)
+                f.write(_dumps(report, indent=True))
             
             self.logger.info(f"Recovery report saved to: {report_path}")
             return report_path
@@ -430,9 +632,15 @@ class FailureAnalyzer:
         """Validate if recovery was successful for a specific date"""
         processed_csv = self.config.get_processed_csv_path(date)
         
+        # One stat answers both "exists" and "how big"
+        try:
+            csv_stat = os.stat(processed_csv)
+        except FileNotFoundError:
+            csv_stat = None
+        
         validation_result = {
             "date": date,
-            "csv_exists": os.path.exists(processed_csv),
+            "csv_exists": csv_stat is not None,
             "csv_size": 0,
             "record_count": 0,
             "validation_passed": False,
@@ -442,11 +650,10 @@ class FailureAnalyzer:
         if validation_result["csv_exists"]:
             try:
                 # Get file size
-                validation_result["csv_size"] = os.path.getsize(processed_csv)
+                validation_result["csv_size"] = csv_stat.st_size
                 
                 # Count records (approximate)
-                with open(processed_csv, 'r') as f:
-                    line_count = sum(1 for _ in f) - 1  # Subtract header
+                line_count = _count_lines(processed_csv) - 1  # Subtract header
                 validation_result["record_count"] = line_count
                 
                 # Basic validation
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, timedelta
 from dotenv import load_dotenv
 
@@ -61,8 +62,10 @@ def download_test_prices():
         print(f"Records loaded: {download_stats['total_records']:,}")
         
         print(f"\nSample queries:")
-        print(f"1. Daily prices: {loader.get_daily_price_query(test_date)}")
-        print(f"2. Product trends: {loader.get_price_trends_query(281940, 7)}")  # Example product ID
+        daily_sql, daily_params = loader.get_daily_price_query(test_date)
+        trends_sql, trends_params = loader.get_price_trends_query(281940, 7)  # Example product ID
+        print(f"1. Daily prices: {daily_sql}   params: {[(p.name, p.value) for p in daily_params]}")
+        print(f"2. Product trends: {trends_sql}   params: {[(p.name, p.value) for p in trends_params]}")
         
         print(f"\nNext steps:")
         print("1. Run download_daily_prices() for daily updates")
@@ -120,8 +123,19 @@ def download_daily_prices(target_date: str = None):
         print(f"Failed to load price data for {target_date}")
         return False
 
-def download_historical_prices(start_date: str, end_date: str = None):
-    """Download historical price data for a date range"""
+# Dates processed at once in a backfill. Each worker runs a whole download_daily_prices:
+# archive download, 7z extraction, its own parse pool and a full day of prices in memory,
+# so peak memory grows linearly with this number
+BACKFILL_WORKERS = 2
+
+def download_historical_prices(start_date: str, end_date: str = None, max_workers: int = BACKFILL_WORKERS):
+    """Download historical price data for a date range, a few dates at a time
+    
+    Args:
+        start_date: First date to backfill (YYYY-MM-DD)
+        end_date: Last date to backfill, defaults to yesterday
+        max_workers: Dates processed concurrently; each holds a full day of prices in memory
+    """
     if end_date is None:
         end_date = (date.today() - timedelta(days=1)).strftime('%Y-%m-%d')
     
@@ -132,27 +146,26 @@ def download_historical_prices(start_date: str, end_date: str = None):
     start = datetime.strptime(start_date, '%Y-%m-%d').date()
     end = datetime.strptime(end_date, '%Y-%m-%d').date()
     
-    current_date = start
     success_count = 0
     total_days = (end - start).days + 1
+    dates = [(start + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(total_days)]
     
-    print(f"Will process {total_days} days of price data")
+    print(f"Will process {total_days} days of price data ({max_workers} at a time)")
     
-    while current_date <= end:
-        date_str = current_date.strftime('%Y-%m-%d')
-        print(f"\nProcessing {date_str}...")
-        
-        try:
-            success = download_daily_prices(date_str)
-            if success:
-                success_count += 1
-                print(f"  ✓ Success ({success_count}/{total_days})")
-            else:
-                print(f"  ✗ Failed")
-        except Exception as e:
-            print(f"  ✗ Error: {e}")
+    # Each date is an independent download + load, bound on network I/O rather than the GIL
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(download_daily_prices, date_str): date_str for date_str in dates}
         
-        current_date += timedelta(days=1)
+        for future in as_completed(futures):
+            date_str = futures[future]
+            try:
+                if future.result():
+                    success_count += 1
+                    print(f"  ✓ {date_str} success ({success_count}/{total_days})")
+                else:
+                    print(f"  ✗ {date_str} failed")
+            except Exception as e:
+                print(f"  ✗ {date_str} error: {e}")
     
     print(f"\n=== Historical Backfill Complete ===")
     print(f"Successful: {success_count}/{total_days} days")
@@ -164,7 +177,7 @@ def main():
         print("Usage:")
         print("  python3 main_price.py test              # Download and test with 1 day")
         print("  python3 main_price.py daily [YYYY-MM-DD] # Download daily prices")
-        print("  python3 main_price.py backfill START_DATE [END_DATE] # Historical backfill")
+        print("  python3 main_price.py backfill START_DATE [END_DATE] [--workers N] # Historical backfill")
         return
     
     command = sys.argv[1]
@@ -175,14 +188,27 @@ def main():
         target_date = sys.argv[2] if len(sys.argv) > 2 else None
         download_daily_prices(target_date)
     elif command == "backfill":
-        if len(sys.argv) < 3:
+        args = sys.argv[2:]
+        max_workers = BACKFILL_WORKERS
+        if "--workers" in args:
+            i = args.index("--workers")
+            try:
+                max_workers = int(args[i + 1])
+            except (IndexError, ValueError):
+                max_workers = 0
+            if max_workers < 1:
+                print("Error: --workers requires a positive integer")
+                return
+            del args[i:i + 2]
+        
+        if not args:
             print("Error: backfill requires start date")
-            print("Usage: python3 main_price.py backfill 2024-02-08 [2024-12-01]")
+            print(f"Usage: python3 main_price.py backfill 2024-02-08 [2024-12-01] [--workers {BACKFILL_WORKERS}]")
             return
         
-        start_date = sys.argv[2]
-        end_date = sys.argv[3] if len(sys.argv) > 3 else None
-        download_historical_prices(start_date, end_date)
+        start_date = args[0]
+        end_date = args[1] if len(args) > 1 else None
+        download_historical_prices(start_date, end_date, max_workers)
     else:
         print(f"Unknown command: {command}")
         print("Available commands: test, daily, backfill")
@@ -165,10 +165,10 @@ class PriceLoggerConfig:
         )
     
     def get_failure_log_filename(self, date_str: str) -> str:
-        """Get failure log filename for a specific date"""
+        """Get failure log filename for a specific date (one file per month)"""
         return os.path.join(
             self.directories.failures_path,
-            f"failures_{date_str}.json"
+            f"failures_{date_str[:7]}.jsonl"
         )
     
     def get_raw_archive_path(self, date_str: str) -> str:
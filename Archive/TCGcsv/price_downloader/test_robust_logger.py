@@ -140,15 +140,16 @@ def test_failure_analyzer():
     print(f"✓ Failure recorded: {failure.date} - {failure.failure_type}")
     
     # Test failure file creation
+    analyzer.flush()
     failure_file = config.get_failure_log_filename("2024-12-01")
     if os.path.exists(failure_file):
         print(f"✓ Failure file created: {failure_file}")
         
         # Verify file content
         with open(failure_file, 'r') as f:
-            failure_data = json.load(f)
+            failure_data = [json.loads(line) for line in f]
         
-        if len(failure_data) > 0 and failure_data[0]['date'] == "2024-12-01":
+        if any(record['date'] == "2024-12-01" for record in failure_data):
             print(f"✓ Failure data saved correctly")
         else:
             print(f"✗ Failure data incorrect")